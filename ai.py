@@ -0,0 +1,219 @@
+"""
+AI module for the Sebastopol game.
+Contains flow-field pathfinding and controllers for computer-driven tanks.
+"""
+import numpy as np
+from units import TankUnit
+from config import *
+
+UNREACHABLE = np.iinfo(np.int32).max
+
+class FlowField:
+    """
+    Distance and direction field over the World cell grid.
+    Every cell stores the next move (an index into TankUnit.directions) towards
+    the nearest target, so all AI tanks chasing the same targets share one field.
+    """
+    def __init__(self, cols, rows):
+        self.cols = cols
+        self.rows = rows
+        self.distance = np.full((rows, cols), UNREACHABLE, dtype=np.int32)
+        self.direction = np.full((rows, cols), -1, dtype=np.int8)
+        self.blocked = np.zeros((rows, cols), dtype=bool)
+        self.targets = None
+
+    def clamp(self, cell):
+        """Clamp a (col, row) cell to the grid."""
+        return (min(max(cell[0], 0), self.cols - 1), min(max(cell[1], 0), self.rows - 1))
+
+    def set_blocked(self, blocked):
+        """Use a new map of cells a tank can't stand on; recomputed on the next update."""
+        self.blocked = blocked
+        self.targets = None
+
+    def update(self, targets):
+        """Recompute the field, but only if the target cells have changed."""
+        targets = frozenset(cell for cell in targets
+                            if 0 <= cell[0] < self.cols and 0 <= cell[1] < self.rows)
+        if targets == self.targets:
+            return False
+        self.targets = targets
+        self.compute()
+        return True
+
+    def compute(self):
+        """Run a vectorized breadth-first search outwards from all targets at once."""
+        self.distance.fill(UNREACHABLE)
+        self.direction.fill(-1)
+        if not self.targets:
+            return
+
+        frontier = np.zeros((self.rows, self.cols), dtype=bool)
+        cols, rows = zip(*self.targets)
+        frontier[rows, cols] = True
+        self.distance[frontier] = 0
+        reached = frontier | self.blocked
+        grown = np.empty_like(frontier)
+        step = 0
+        while frontier.any():
+            step += 1
+            grown.fill(False)
+            grown[:, 1:] |= frontier[:, :-1]
+            grown[:, :-1] |= frontier[:, 1:]
+            grown[1:, :] |= frontier[:-1, :]
+            grown[:-1, :] |= frontier[1:, :]
+            frontier = grown & ~reached
+            self.distance[frontier] = step
+            reached |= frontier
+
+        # Point every cell at its closest neighbour (left, right, up, down)
+        padded = np.full((self.rows + 2, self.cols + 2), UNREACHABLE, dtype=np.int32)
+        padded[1:-1, 1:-1] = self.distance
+        neighbours = np.stack([
+            padded[1:-1, :-2],  # Left
+            padded[1:-1, 2:],   # Right
+            padded[:-2, 1:-1],  # Up
+            padded[2:, 1:-1],   # Down
+        ])
+        closer = neighbours.min(axis=0) < self.distance
+        self.direction[closer] = neighbours.argmin(axis=0)[closer]
+
+    def distance_at(self, cell):
+        """Number of moves from a cell to the nearest target."""
+        col, row = self.clamp(cell)
+        return int(self.distance[row, col])
+
+    def direction_at(self, cell):
+        """Best direction index from a cell, or -1 if there is nowhere better to go."""
+        col, row = self.clamp(cell)
+        return int(self.direction[row, col])
+
+def footprint_blocked(terrain, size=3):
+    """Cells where a tank's size x size footprint (from its top-left cell) would overlap a wall."""
+    solid = terrain > 0
+    rows, cols = solid.shape
+    blocked = np.zeros_like(solid)
+    for dy in range(size):
+        for dx in range(size):
+            blocked[:rows - dy, :cols - dx] |= solid[dy:, dx:]
+    return blocked
+
+def cell_of(obj):
+    """Grid cell (col, row) of a game object's top-left corner."""
+    return int(obj.x) // WORLD_SCALE, int(obj.y) // WORLD_SCALE
+
+def firing_lanes(tank, cols, rows):
+    """Cells from which a tank standing there would hit the given tank."""
+    col, row = cell_of(tank)
+    cells = []
+    for lane in range(-1, 2):
+        cells.extend((x, row + lane) for x in range(cols) if abs(x - col) >= 3)
+        cells.extend((col + lane, y) for y in range(rows) if abs(y - row) >= 3)
+    return cells
+
+def power_up_cells(power_ups):
+    """Cells where a tank would be centred over each power-up."""
+    return [(int(p.x) // WORLD_SCALE - 1, int(p.y) // WORLD_SCALE - 1)
+            for p in power_ups if p.active]
+
+class AIController:
+    """
+    Drives one tank by emitting the same keys a player would press.
+    """
+    def __init__(self, tank, controler, enemy):
+        self.tank = tank
+        self.controler = controler
+        self.enemy = enemy
+        self.keys = TankUnit.CONTROLS[controler]
+        self.move_timer = 0
+        self.fire_timer = 0
+
+    def aim(self):
+        """Direction index pointing at the enemy if it is in a firing lane, else -1."""
+        col, row = cell_of(self.tank)
+        enemy_col, enemy_row = cell_of(self.enemy)
+        if abs(row - enemy_row) <= 1:
+            return 0 if enemy_col < col else 1
+        if abs(col - enemy_col) <= 1:
+            return 2 if enemy_row < row else 3
+        return -1
+
+    def think(self, hunt, loot):
+        """Return the keys to press this frame."""
+        self.move_timer = max(0, self.move_timer - 1)
+        self.fire_timer = max(0, self.fire_timer - 1)
+        if self.move_timer:
+            return []
+
+        cell = cell_of(self.tank)
+        aim = self.aim()
+        if aim >= 0 and loot.distance_at(cell) >= hunt.distance_at(cell):
+            if aim == self.tank.direction_num:
+                if self.fire_timer:
+                    return []
+                self.fire_timer = AI_FIRE_INTERVAL
+                return [self.keys[4]]
+            # Turning also moves one cell, which keeps us in the lane
+            self.move_timer = AI_MOVE_INTERVAL
+            return [self.keys[aim]]
+
+        field = loot if loot.distance_at(cell) < hunt.distance_at(cell) else hunt
+        direction = field.direction_at(cell)
+        if direction < 0:
+            return []
+        self.move_timer = AI_MOVE_INTERVAL
+        return [self.keys[direction]]
+
+class AIDirector:
+    """
+    Owns the flow fields shared by all AI tanks and runs their controllers.
+    """
+    def __init__(self, world):
+        self.cols = world.width // WORLD_SCALE
+        self.rows = world.height // WORLD_SCALE
+        self.loot = FlowField(self.cols, self.rows)
+        self.hunt = {}  # one field per hunted tank
+        self.controllers = []
+        self.blocked = np.zeros((self.rows, self.cols), dtype=bool)
+        self.terrain_version = None
+
+    def add(self, tank, controler, enemy):
+        """Hand a tank over to the computer."""
+        controller = AIController(tank, controler, enemy)
+        self.controllers.append(controller)
+        return controller
+
+    def reset(self):
+        """Forget all controllers, e.g. when the tanks are recreated."""
+        self.controllers = []
+        self.hunt = {}
+
+    def update(self, world):
+        """Refresh the shared fields and return (controller, keys) for every AI tank."""
+        if world.terrain_version != self.terrain_version:
+            # Walls changed: every field has to route around the new ones
+            self.terrain_version = world.terrain_version
+            self.blocked = footprint_blocked(world.terrain[:self.rows, :self.cols])
+            for field in [self.loot, *self.hunt.values()]:
+                field.set_blocked(self.blocked)
+        self.loot.update(power_up_cells(world.power_ups))
+        actions = []
+        for controller in self.controllers:
+            hunt = self.hunt.get(id(controller.enemy))
+            if hunt is None:
+                hunt = self.hunt[id(controller.enemy)] = FlowField(self.cols, self.rows)
+                hunt.set_blocked(self.blocked)
+            hunt.update(firing_lanes(controller.enemy, self.cols, self.rows))
+            actions.append((controller, controller.think(hunt, self.loot)))
+        return actions
+
+    def drive(self, game):
+        """
+        Update the controllers and tap their keys on a match. Every press is
+        released straight away, as a player taps a key; otherwise a tank with a
+        speed boost keeps sliding between decisions.
+        """
+        for controller, keys in self.update(game.world):
+            for key in keys:
+                game.handle_key(controller.controler, key)
+                game.handle_key(controller.controler, key, key_up=True)
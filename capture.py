@@ -0,0 +1,158 @@
+"""
+Capture module for the Sebastopol game.
+Contains the FrameRecorder that saves gameplay frames without stalling the game loop.
+"""
+import os
+import queue
+import threading
+import struct
+import time
+import zlib
+import numpy as np
+import pygame
+from config import *
+
+def png_chunk(kind, data):
+    """One length-prefixed, CRC-checked PNG chunk."""
+    return struct.pack("!I", len(data)) + kind + data + struct.pack("!I", zlib.crc32(kind + data))
+
+def encode_png(pixels, level=1):
+    """
+    Encode a (width, height, 3) RGB array as PNG bytes. The heavy part is
+    zlib.compress, which releases the GIL, unlike pygame.image.save, so this can
+    run on a thread without stalling the game loop.
+    """
+    width, height = pixels.shape[:2]
+    rows = np.zeros((height, width * 3 + 1), np.uint8)  # column 0: filter type 0 (none)
+    rows[:, 1:] = pixels.transpose(1, 0, 2).reshape(height, width * 3)
+    header = struct.pack("!IIBBBBB", width, height, 8, 2, 0, 0, 0)  # 8-bit RGB
+    return (b"\x89PNG\r\n\x1a\n" + png_chunk(b"IHDR", header) +
+            png_chunk(b"IDAT", zlib.compress(rows.tobytes(), level)) + png_chunk(b"IEND", b""))
+
+class FrameRecorder:
+    """
+    Records rendered frames to disk on a background thread.
+    The game loop only copies the finished frame into one of a fixed pool of
+    reusable buffers; the writer thread compresses and saves it, then hands the
+    buffer back. Encoding is done with numpy and zlib, which release the GIL for
+    the expensive parts. When every buffer is still waiting to be written the frame is
+    dropped (and counted) rather than making the game wait.
+    """
+    def __init__(self, directory, size, fmt=CAPTURE_FORMAT, buffers=CAPTURE_QUEUE, every=CAPTURE_EVERY):
+        self.directory = directory
+        self.format = fmt
+        self.every = max(1, every)
+        self.size = size
+        os.makedirs(directory, exist_ok=True)
+        self.stream = open(os.path.join(directory, "frames.rgb"), "wb") if fmt == "raw" else None
+
+        # Buffers cycle free -> pending -> free; both queues hold at most all of them
+        self.free = queue.Queue()
+        self.pending = queue.Queue()
+        for _ in range(buffers):
+            self.free.put(pygame.Surface(size, 0, 32))
+        self.buffers = buffers
+
+        # Statistics
+        self.frames = 0  # frames offered to capture()
+        self.captured = 0
+        self.dropped = 0
+        self.written = 0
+        self.copy_time = 0.0  # seconds spent in the game loop
+        self.copy_max = 0.0
+        self.write_time = 0.0  # seconds spent by the writer thread
+        self.depth_total = 0
+        self.depth_max = 0
+        self.first_time = None  # when the first and last frames were captured
+        self.last_time = None
+        self.error = None  # what stopped the writer thread, if anything
+
+        self.worker = threading.Thread(target=self.write_frames, name="FrameRecorder", daemon=True)
+        self.worker.start()
+
+    def capture(self, screen):
+        """Copy the frame on the renderer into a free buffer. Call before present()."""
+        self.frames += 1
+        if self.error is not None or (self.frames - 1) % self.every:
+            return False
+        start = time.perf_counter()
+        try:
+            buffer = self.free.get_nowait()
+        except queue.Empty:
+            self.dropped += 1  # the writer is behind; never block the game
+            return False
+        screen.read_pixels(buffer)
+        self.pending.put((self.captured, buffer))
+        self.captured += 1
+        if self.first_time is None:
+            self.first_time = start
+        self.last_time = start
+
+        elapsed = time.perf_counter() - start
+        self.copy_time += elapsed
+        self.copy_max = max(self.copy_max, elapsed)
+        depth = self.pending.qsize()
+        self.depth_total += depth
+        self.depth_max = max(self.depth_max, depth)
+        return True
+
+    def write_frames(self):
+        """Writer thread: save pending buffers until close() sends None or a write fails."""
+        while True:
+            item = self.pending.get()
+            if item is None:
+                break
+            index, buffer = item
+            start = time.perf_counter()
+            pixels = pygame.surfarray.pixels3d(buffer)
+            try:
+                if self.stream is not None:
+                    self.stream.write(np.ascontiguousarray(pixels.transpose(1, 0, 2)))
+                else:
+                    data = encode_png(pixels)
+                    with open(os.path.join(self.directory, f"frame_{index:06d}.png"), "wb") as f:
+                        f.write(data)
+            except Exception as e:
+                # e.g. disk full: stop recording, but don't take the game down
+                self.error = e
+                print(f"Capture stopped after {self.written} frames: {e}")
+                break
+            finally:
+                del pixels  # unlock the buffer before handing it back
+            self.write_time += time.perf_counter() - start
+            self.written += 1
+            self.free.put(buffer)
+
+    def close(self):
+        """Write out the frames still queued and stop the writer thread."""
+        self.pending.put(None)
+        self.worker.join()
+        if self.stream is not None:
+            try:
+                self.stream.close()
+            except OSError as e:  # flushing the last frames can fail too
+                self.error = self.error or e
+
+    def rate(self):
+        """Frames captured per second of wall time, which is what playback should use."""
+        if self.captured < 2 or self.last_time <= self.first_time:
+            return (RENDER_FPS or FPS) / self.every  # too short to measure
+        return (self.captured - 1) / (self.last_time - self.first_time)
+
+    def report(self):
+        """Capture overhead and queue statistics."""
+        captured = max(1, self.captured)
+        lines = [
+            f"Capture: {self.written} frames written to {self.directory}, {self.dropped} dropped "
+            f"(every {self.every} of {self.frames} rendered)",
+            f"  copy in game loop: {self.copy_time / captured * 1000:.2f} ms/frame avg, {self.copy_max * 1000:.2f} ms max",
+            f"  writer: {self.write_time / max(1, self.written) * 1000:.2f} ms/frame",
+            f"  queue depth: {self.depth_total / captured:.1f} avg, {self.depth_max} max of {self.buffers}",
+        ]
+        if self.error is not None:
+            lines.append(f"  FAILED: {self.error!r}")
+        if self.stream is not None:
+            width, height = self.size
+            lines.append(f"  encode with: ffmpeg -f rawvideo -pix_fmt rgb24 -s {width}x{height} "
+                         f"-r {self.rate():.2f} -i {self.stream.name} capture.mp4")
+        return "\n".join(lines)
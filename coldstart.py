@@ -0,0 +1,61 @@
+"""
+Cold-start benchmark for the Sebastopol game.
+Launches the game in fresh interpreters with --profile-startup and reports
+the median time of every startup phase, from process launch to the first
+frame and to the game being ready to play.
+
+    python coldstart.py --runs 10 [--budget 300]
+"""
+import os
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+def run_once(extra_args):
+    """Start the game once; return [(phase, ms)] measured from process launch."""
+    env = dict(os.environ)
+    env.setdefault("SDL_VIDEODRIVER", "dummy")
+    env.setdefault("SDL_AUDIODRIVER", "dummy")
+    launched = time.perf_counter()
+    output = subprocess.run([sys.executable, "main.py", "--profile-startup"] + extra_args,
+                            capture_output=True, text=True, env=env,
+                            cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    lines = output[output.index("Startup profile"):].splitlines()
+
+    # perf_counter is the same monotonic clock in both processes, so the gap
+    # between launch and main.py's first line is the interpreter's own startup
+    started = float(lines[0].split("started at ")[1].rstrip("):"))
+    phases = [("interpreter", (started - launched) * 1000)]
+    for line in lines[1:]:
+        name, ms = line[:18].strip(), float(line[18:].split()[0])
+        phases.append((name, ms))
+    return phases
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time-to-first-frame benchmark")
+    parser.add_argument("--runs", type=int, default=10, help="fresh interpreters to start")
+    parser.add_argument("--budget", type=float, help="fail if the median time to the first frame exceeds this (ms)")
+    parser.add_argument("--renderer", choices=("surface", "texture"), default="surface")
+    args = parser.parse_args(argv)
+
+    runs = [run_once(["--renderer", args.renderer]) for _ in range(args.runs)]
+    names = [name for name, _ in runs[0]]
+    print(f"Cold start, median of {args.runs} runs ({args.renderer} renderer):")
+    total = 0.0
+    first_frame = None
+    for i, name in enumerate(names):
+        median = statistics.median(run[i][1] for run in runs)
+        total += median
+        print(f"  {name:<16}{median:8.1f} ms {total:8.1f} ms")
+        if name == "first frame":
+            first_frame = total
+    print(f"Time to first frame: {first_frame:.1f} ms, ready to play: {total:.1f} ms")
+    if args.budget is not None and first_frame > args.budget:
+        print(f"FAIL: over the {args.budget:.0f} ms budget")
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
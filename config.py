@@ -7,10 +7,17 @@ Contains constants and settings used throughout the game.
 WORLD_SCALE = 16
 SCREEN_WIDTH = 800
 SCREEN_HEIGHT = 800
+RENDERER = "surface"  # "surface" (software blits) or "texture" (SDL2 renderer)
+LOGICAL_RENDERING = False  # draw background layers at one pixel per cell and upscale
 
 # Game settings
-FPS = 30
+FPS = 30  # simulation steps per second
+RENDER_FPS = 60  # render rate cap (0 = as fast as the display allows)
+MAX_FRAME_SKIP = 5  # renders that may be skipped in a row to catch up
+MAX_FRAME_TIME = 0.25  # seconds of lag simulated at most after a stall
+LOW_LATENCY = False  # sample input right before each step and render the newest state
 BACKGROUND_COLOR = (123, 137, 100)
+PLAYER_LIVES = 3
 
 # Tank settings
 TANK_TRAIL_MAX = 5
@@ -18,6 +25,27 @@ TANK_TRAIL_DURATION = 500
 TANK_SHAKE_FRAMES = 15
 TANK_SHAKE_INTENSITY = 4
 
+# Quality levels, from cheapest to best. The quality governor steps down a
+# level when the work per frame misses the budget and back up when there is
+# headroom. Work time leaves out the frame-rate sleep.
+#   logical: draw the background at one pixel per cell and upscale
+#   shimmer: draw the shimmering background at all
+#   shimmer_interval: frames between shimmer updates (logical mode)
+#   trail: ghost copies drawn per tank
+#   shake: shake tanks when they fire or get hit
+#   shield: draw the shield bubble
+QUALITY_LEVELS = [
+    {"name": "minimal", "logical": False, "shimmer": False, "shimmer_interval": 1, "trail": 0, "shake": False, "shield": False},
+    {"name": "low", "logical": True, "shimmer": True, "shimmer_interval": 4, "trail": 0, "shake": False, "shield": False},
+    {"name": "medium", "logical": True, "shimmer": True, "shimmer_interval": 1, "trail": 2, "shake": False, "shield": True},
+    {"name": "high", "logical": False, "shimmer": True, "shimmer_interval": 1, "trail": TANK_TRAIL_MAX, "shake": True, "shield": True},
+]
+QUALITY = "auto"  # a level name, or "auto" to let the governor choose
+QUALITY_FRAME_BUDGET = 1000 / 30  # ms of work per frame before effects are stepped down
+QUALITY_HEADROOM = 0.5  # step back up when frames need less than this share of the budget
+QUALITY_WINDOW = 30  # frames in the rolling work-time window
+QUALITY_HOLD = 90  # frames to wait after a change before changing again
+
 # Sound settings
 LASER_VOLUME = 0.5
 HIT_VOLUME = 0.1
@@ -28,4 +56,30 @@ BULLET_SPEED = 1
 
 # Power-up settings
 POWERUP_DURATION = 10000  # 10 seconds
-POWERUP_SPAWN_RATE = 0.005  # 0.5% chance per frame
\ No newline at end of file
+POWERUP_SPAWN_RATE = 0.005  # 0.5% chance per frame
+POWERUP_TTL = 15000  # ms before an uncollected power-up disappears
+POWERUP_MAX = 3  # power-ups on the field at once
+
+# Terrain settings
+TERRAIN_MAP = "maps/default.png"  # PNG mask (bright pixel = wall, one pixel per cell) or .bin bitmap; None for an open field
+TERRAIN_HP = 3  # hits a wall cell takes before it is destroyed
+TERRAIN_COLOR = (70, 60, 50)
+
+# Resource cache settings
+IMAGE_CACHE_MAX = 64
+SOUND_CACHE_MAX = 16
+
+# AI settings
+AI_MOVE_INTERVAL = 4  # frames between AI moves
+AI_FIRE_INTERVAL = 15  # frames between AI shots
+
+# Network play settings
+NET_INPUT_DELAY = 2  # frames local input is held back to hide latency
+NET_MAX_ROLLBACK = 8  # frames we may run ahead of confirmed remote input
+NET_CHECKSUM_INTERVAL = 30  # frames between desync checks
+NET_RESTART_DELAY = 3000  # ms from game over to the next round
+
+# Capture settings
+CAPTURE_FORMAT = "png"  # "png" (one file per frame) or "raw" (one RGB24 stream)
+CAPTURE_QUEUE = 8  # frame buffers; frames are dropped when all are waiting to be written
+CAPTURE_EVERY = 1  # capture one rendered frame in N
@@ -2,12 +2,18 @@
 Main module for the Sebastopol game.
 Contains the game loop and main game logic.
 """
+import time
+STARTED = time.perf_counter()  # before the heavy imports, for --profile-startup
 import pygame
-import numpy as np
 import sys
-import world
-import units
-from utils import ResourceManager
+import argparse
+import atexit
+import match
+import render
+import quality
+import ai
+from units import TankUnit
+from utils import ResourceManager, SimClock, RateCounter, PhaseTimer, InputLatency
 from config import *
 
 class GameState:
@@ -27,59 +33,60 @@ def draw_scene(surface, bg, player_one, player_two):
 def draw_game_over(screen, winner=None):
     """Draw the game over screen."""
     screen.fill(BACKGROUND_COLOR)
-    f1 = pygame.font.Font("pixels/8-BIT WONDER.TTF", 64)
+    resource_manager = ResourceManager.get_instance()
+    f1 = resource_manager.get_font("pixels/8-BIT WONDER.TTF", 64)
     over = f1.render("GAME OVER", True, (142, 148, 136))
     over_rect = over.get_rect(center=(screen.get_width() // 2, screen.get_height() // 2 - 50))
     screen.blit(over, over_rect)
     
     if winner:
-        f2 = pygame.font.Font("pixels/PressStart2P-Regular.TTF", 24)
+        f2 = resource_manager.get_font("pixels/PressStart2P-Regular.ttf", 24)
         winner_text = f2.render(f"PLAYER {winner} WINS!", True, (142, 148, 136))
         winner_rect = winner_text.get_rect(center=(screen.get_width() // 2, screen.get_height() // 2 + 50))
         screen.blit(winner_text, winner_rect)
     
-    f3 = pygame.font.Font("pixels/PressStart2P-Regular.TTF", 16)
+    f3 = resource_manager.get_font("pixels/PressStart2P-Regular.ttf", 16)
     restart = f3.render("PRESS SPACE TO RESTART", True, (142, 148, 136))
     restart_rect = restart.get_rect(center=(screen.get_width() // 2, screen.get_height() // 2 + 120))
     screen.blit(restart, restart_rect)
+
+def draw_menu(screen, blink=True):
+    """Draw the title screen."""
+    resource_manager = ResourceManager.get_instance()
+    f2 = resource_manager.get_font("pixels/PressStart2P-Regular.ttf", 24)
+    f3 = resource_manager.get_font("pixels/PressStart2P-Regular.ttf", 16)
+    screen.fill(BACKGROUND_COLOR)
+
+    # Load and display the title image
+    image = resource_manager.get_image("pixels/sebastopol.png")
+    image = pygame.transform.scale(image, (1000/2, 600/2))
+    image_rect = image.get_rect(center=(screen.get_width() // 2, screen.get_height() // 2 - 50))
+    screen.blit(image, image_rect)
+    
+    # Display game controls
+    controls1 = f3.render("PLAYER 1: ARROWS + RIGHT SHIFT", True, (142, 148, 136))
+    controls1_rect = controls1.get_rect(center=(screen.get_width() // 2, screen.get_height() // 2 + 100))
+    screen.blit(controls1, controls1_rect)
     
-    pygame.display.flip()
+    controls2 = f3.render("PLAYER 2: WASD + E", True, (142, 148, 136))
+    controls2_rect = controls2.get_rect(center=(screen.get_width() // 2, screen.get_height() // 2 + 130))
+    screen.blit(controls2, controls2_rect)
+    
+    # Blinking "Press any key"
+    if blink:
+        prompt = f2.render("Press any key to start", True, (142, 148, 136))
+        prompt_rect = prompt.get_rect(center=(screen.get_width() // 2, screen.get_height() // 2 + 180))
+        screen.blit(prompt, prompt_rect)
 
 def menu_loop(screen):
     """Display and handle the menu screen."""
     blink = True
     blink_timer = 0
     running = True
-    f1 = pygame.font.Font("pixels/8-BIT WONDER.TTF", 64)
-    f2 = pygame.font.Font("pixels/PressStart2P-Regular.TTF", 24)
-    f3 = pygame.font.Font("pixels/PressStart2P-Regular.TTF", 16)
     
     while running:
-        screen.fill(BACKGROUND_COLOR)
-
-        # Load and display the title image
-        resource_manager = ResourceManager.get_instance()
-        image = resource_manager.get_image("pixels/sebastopol.png")
-        image = pygame.transform.scale(image, (1000/2, 600/2))
-        image_rect = image.get_rect(center=(screen.get_width() // 2, screen.get_height() // 2 - 50))
-        screen.blit(image, image_rect)
-        
-        # Display game controls
-        controls1 = f3.render("PLAYER 1: ARROWS + RIGHT SHIFT", True, (142, 148, 136))
-        controls1_rect = controls1.get_rect(center=(screen.get_width() // 2, screen.get_height() // 2 + 100))
-        screen.blit(controls1, controls1_rect)
-        
-        controls2 = f3.render("PLAYER 2: WASD + E", True, (142, 148, 136))
-        controls2_rect = controls2.get_rect(center=(screen.get_width() // 2, screen.get_height() // 2 + 130))
-        screen.blit(controls2, controls2_rect)
-        
-        # Blinking "Press any key"
-        if blink:
-            prompt = f2.render("Press any key to start", True, (142, 148, 136))
-            prompt_rect = prompt.get_rect(center=(screen.get_width() // 2, screen.get_height() // 2 + 180))
-            screen.blit(prompt, prompt_rect)
-
-        pygame.display.flip()
+        draw_menu(screen, blink)
+        screen.present()
         pygame.time.delay(100)
         blink_timer += 1
         if blink_timer % 10 == 0:
@@ -92,34 +99,167 @@ def menu_loop(screen):
             elif event.type == pygame.KEYDOWN:
                 return  # Exit menu and start game
 
-def main():
+def simulate_step(game, director, events, ai_player):
+    """Advance the match by one fixed simulation step, applying queued key events."""
+    SimClock.advance(1000 / FPS)
+    game.save_positions()
+    for event in events:
+        key_up = event.type == pygame.KEYUP
+        game.handle_key(0, event.key, key_up=key_up)
+        if not ai_player:
+            game.handle_key(1, event.key, key_up=key_up)
+
+    # Let the computer press its keys
+    director.drive(game)
+
+    return game.update()
+
+def poll_keys(events, held, watched):
+    """
+    Low-latency input: compare pygame.key.get_pressed() with the keys held at
+    the previous sample and return KEYDOWN/KEYUP events for the changes.
+    KEYDOWN events from the queue catch taps that were pressed and released
+    between two samples, which polling alone would miss.
+    """
+    pressed = pygame.key.get_pressed()
+    taps = [event.key for event in events if event.type == pygame.KEYDOWN and event.key in watched]
+    changes = []
+    for key in watched:
+        down = pressed[key]
+        presses = taps.count(key)
+        if presses:
+            # Every press counts, even ones released since
+            if key in held:
+                changes.append(pygame.event.Event(pygame.KEYUP, key=key))
+            for i in range(presses):
+                if i:
+                    changes.append(pygame.event.Event(pygame.KEYUP, key=key))
+                changes.append(pygame.event.Event(pygame.KEYDOWN, key=key))
+            if not down:
+                changes.append(pygame.event.Event(pygame.KEYUP, key=key))
+        elif down and key not in held:
+            changes.append(pygame.event.Event(pygame.KEYDOWN, key=key))
+        elif key in held and not down:
+            changes.append(pygame.event.Event(pygame.KEYUP, key=key))
+        if down:
+            held.add(key)
+        else:
+            held.discard(key)
+    return changes
+
+def parse_args(argv=None):
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Sebastopol")
+    parser.add_argument("--ai", action="store_true", help="let the computer drive player 2")
+    parser.add_argument("--renderer", choices=("surface", "texture"), default=RENDERER,
+                        help="draw with software surface blits or SDL2 textures")
+    parser.add_argument("--software", action="store_true", help="force SDL's software renderer for textures")
+    parser.add_argument("--logical", action="store_true", default=LOGICAL_RENDERING,
+                        help="draw the background at one pixel per cell and scale it up")
+    parser.add_argument("--quality", choices=["auto"] + [level["name"] for level in QUALITY_LEVELS],
+                        default=QUALITY, help="effects quality, or auto to adapt to the frame rate")
+    parser.add_argument("--trace-blits", action="store_true",
+                        help="record the cost of every blit and print a report at exit")
+    parser.add_argument("--capture", metavar="DIR", help="record rendered frames into DIR")
+    parser.add_argument("--capture-format", choices=("png", "raw"), default=CAPTURE_FORMAT,
+                        help="PNG files, or one raw RGB24 stream (cheaper to write)")
+    parser.add_argument("--capture-every", type=int, default=CAPTURE_EVERY, metavar="N",
+                        help="record one rendered frame in N")
+    parser.add_argument("--low-latency", action="store_true", default=LOW_LATENCY,
+                        help="sample keys right before each step and draw the newest state at once "
+                             "(renders at the simulation rate)")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="print the time spent in each startup phase and quit once the game is loaded")
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """Main game function."""
-    pygame.init()
-    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-    pygame.display.set_caption("Sebastopol")
-    clock = pygame.time.Clock()
+    args = parse_args(argv)
+    startup = PhaseTimer(STARTED)
+    startup.mark("imports")
 
-    # Load resources using ResourceManager
-    resource_manager = ResourceManager.get_instance()
-    pixel_off = resource_manager.get_image('pixels/b0.png')
-    po = resource_manager.get_image('pixels/b01.png')
-    pixel_on = resource_manager.get_image('pixels/b1.png')
+    # Only what the title screen needs comes before the first frame
+    pygame.display.init()
+    pygame.font.init()
+    screen = render.create_renderer(args.renderer, (SCREEN_WIDTH, SCREEN_HEIGHT), "Sebastopol", args.software)
+    if args.trace_blits:
+        screen = render.BlitTracer(screen)
+        atexit.register(screen.print_report)
+    startup.mark("display")
+    draw_menu(screen)
+    startup.mark("menu")
+    screen.present()
+    startup.mark("first frame")
+
+    # Everything else loads behind the title screen
+    pygame.init()  # mixer and the remaining modules
+    startup.mark("pygame.init")
+    clock = pygame.time.Clock()
+    recorder = None
+    if args.capture:
+        import capture  # only needed when recording
+        recorder = capture.FrameRecorder(args.capture, screen.get_size(), args.capture_format,
+                                         every=args.capture_every)
 
     # Game state
     game_state = GameState.MENU
     winner = None
-    player_lives = [3, 3]  # Lives for player 1 and player 2
     
     # Create game objects
-    bg = world.World(1600 + WORLD_SCALE, 880 + WORLD_SCALE, pixel_off, po)
-    player_one = units.TankUnit([[0, 1, 0], [1, 1, 1], [1, 0, 1]], 4 * WORLD_SCALE, 4 * WORLD_SCALE, pixel_on)
-    player_two = units.TankUnit([[0, 1, 0], [1, 1, 1], [1, 0, 1]], 6 * WORLD_SCALE, 10 * WORLD_SCALE, pixel_on)
+    bg = match.create_world()
+    startup.mark("world")
+    game = match.create_match(bg)
+    startup.mark("match")
+
+    # Effects quality, adapted to the frame time unless fixed on the command line
+    levels = QUALITY_LEVELS
+    if args.logical:
+        levels = [dict(level, logical=True) if level["shimmer"] else level for level in levels]
+    governor = quality.QualityGovernor(levels, args.quality)
+
+    # Computer-controlled tanks
+    director = ai.AIDirector(bg)
+    if args.ai:
+        director.add(game.player_two, controler=1, enemy=game.player_one)
+    startup.mark("ready")
+    if args.profile_startup:
+        print(startup.report())
+        pygame.quit()
+        return
+
+    # Fixed-timestep loop: the simulation advances in steps of 1/FPS seconds
+    # no matter how fast frames are rendered, and renders are skipped (never
+    # steps) when the machine falls behind.
+    step_time = 1 / FPS
+    accumulator = 0.0
+    previous = time.perf_counter()
+    skipped_renders = 0
+    pending_events = []  # key events waiting for the next simulation step
+    rates = RateCounter()
+    latency = InputLatency()
+    held = set()  # keys down at the last low-latency sample
+    watched = TankUnit.CONTROLS[0] + ([] if args.ai else TankUnit.CONTROLS[1])
+    slept = 0.0
+    SimClock.set(0)
 
     # Game loop
     running = True
     while running:
+        # Low-latency mode paces the loop here, before input is sampled,
+        # so that keys are read as late as possible before the step
+        if args.low_latency and game_state == GameState.PLAYING:
+            wait = step_time - accumulator - (time.perf_counter() - previous)
+            slept = max(wait, 0.0)
+            if wait > 0:
+                time.sleep(wait)
+
+        now = time.perf_counter()
+        accumulator = min(accumulator + now - previous, MAX_FRAME_TIME)
+        previous = now
+
         # Handle events
-        for event in pygame.event.get():
+        events = pygame.event.get()
+        for event in events:
             if event.type == pygame.QUIT:
                 running = False
                 
@@ -129,126 +269,87 @@ def main():
                     game_state = GameState.PLAYING
                     
                 # Playing state
-                elif game_state == GameState.PLAYING:
-                    player_one.move(event.key, controler=0, other_tank=player_two)
-                    player_two.move(event.key, controler=1, other_tank=player_one)
+                elif game_state == GameState.PLAYING and not args.low_latency:
+                    pending_events.append(event)
+                    latency.read()
                     
                 # Game over state
                 elif game_state == GameState.GAME_OVER and event.key == pygame.K_SPACE:
                     # Reset game
                     game_state = GameState.PLAYING
-                    player_lives = [3, 3]
-                    player_one = units.TankUnit([[0, 1, 0], [1, 1, 1], [1, 0, 1]], 4 * WORLD_SCALE, 4 * WORLD_SCALE, pixel_on)
-                    player_two = units.TankUnit([[0, 1, 0], [1, 1, 1], [1, 0, 1]], 6 * WORLD_SCALE, 10 * WORLD_SCALE, pixel_on)
+                    accumulator = 0.0
+                    game.reset()
+                    director.reset()
+                    if args.ai:
+                        director.add(game.player_two, controler=1, enemy=game.player_one)
                     
-            elif event.type == pygame.KEYUP and game_state == GameState.PLAYING:
+            elif event.type == pygame.KEYUP and game_state == GameState.PLAYING and not args.low_latency:
                 # Handle key release for continuous movement
-                player_one.move(event.key, controler=0, key_up=True)
-                player_two.move(event.key, controler=1, key_up=True)
+                pending_events.append(event)
+                latency.read()
         
         # Menu state
         if game_state == GameState.MENU:
             menu_loop(screen)
             game_state = GameState.PLAYING
+            previous = time.perf_counter()
+            continue
             
         # Playing state
         elif game_state == GameState.PLAYING:
-            # Update game objects
-            bg.update([player_one, player_two])
-            player_one.update(other_tank=player_two)
-            player_two.update(other_tank=player_one)
-            
-            
-            # Check for bullet collisions with each other
-            for bullet1 in player_one.bullets[:]:
-                for bullet2 in player_two.bullets[:]:
-                    if bullet1.rect.colliderect(bullet2.rect):
-                        # Remove both bullets when they collide
-                        if bullet1 in player_one.bullets:
-                            player_one.bullets.remove(bullet1)
-                        if bullet2 in player_two.bullets:
-                            player_two.bullets.remove(bullet2)
-                        break
-                
-            # Check for hits
-            hit_bullet = player_one.got_shot(player_two.bullets)
-            if hit_bullet:
-                player_two.bullets.remove(hit_bullet)
-                player_lives[0] -= 1
-                if player_lives[0] <= 0:
+            if args.low_latency:
+                polled = poll_keys(events, held, watched)
+                pending_events.extend(polled)
+                latency.read(len(polled))
+            while accumulator >= step_time:
+                winner = simulate_step(game, director, pending_events, args.ai)
+                pending_events = []
+                latency.applied()
+                accumulator -= step_time
+                rates.count("steps")
+                if winner:
                     game_state = GameState.GAME_OVER
-                    winner = 2
-                
-            hit_bullet = player_two.got_shot(player_one.bullets)
-            if hit_bullet:
-                player_one.bullets.remove(hit_bullet)
-                player_lives[1] -= 1
-                if player_lives[1] <= 0:
-                    game_state = GameState.GAME_OVER
-                    winner = 1
+                    break
+
+            # Skip this render if the next step is already due
+            behind = accumulator + time.perf_counter() - previous >= step_time
+            if behind and skipped_renders < MAX_FRAME_SKIP and not args.low_latency:
+                skipped_renders += 1
+                continue
+            skipped_renders = 0
             
             # Draw everything
-            bg.put_on(screen)
-            bg.turbulence(screen, pygame.time.get_ticks())
-            player_one.put_on(screen)
-            player_two.put_on(screen)
-            
-            # Draw lives
-            f = pygame.font.Font("pixels/PressStart2P-Regular.TTF", 16)
-            lives1 = f.render(f"P1: {'♥' * player_lives[0]}", True, (0, 0, 0))
-            lives2 = f.render(f"P2: {'♥' * player_lives[1]}", True, (0, 0, 0))
-            screen.blit(lives1, (20, 20))
-            screen.blit(lives2, (SCREEN_WIDTH - 120, 20))
-            
-            # Draw power-up timers
-            current_time = pygame.time.get_ticks()
-            
-            # Player 1 power-up timers
-            y_offset = 50
-            if player_one.has_shield:
-                remaining = max(0, (player_one.shield_timer - current_time) / 1000)
-                shield_text = f.render(f"P1 Shield: {remaining:.1f}s", True, (0, 0, 255))
-                screen.blit(shield_text, (20, y_offset))
-                y_offset += 25
-                
-            if player_one.has_speed_boost:
-                remaining = max(0, (player_one.speed_boost_timer - current_time) / 1000)
-                speed_text = f.render(f"P1 Speed: {remaining:.1f}s", True, (0, 255, 0))
-                screen.blit(speed_text, (20, y_offset))
-                y_offset += 25
-                
-            if player_one.has_rapid_fire:
-                remaining = max(0, (player_one.rapid_fire_timer - current_time) / 1000)
-                fire_text = f.render(f"P1 Fire: {remaining:.1f}s", True, (255, 0, 0))
-                screen.blit(fire_text, (20, y_offset))
-            
-            # Player 2 power-up timers
-            y_offset = 50
-            if player_two.has_shield:
-                remaining = max(0, (player_two.shield_timer - current_time) / 1000)
-                shield_text = f.render(f"P2 Shield: {remaining:.1f}s", True, (0, 0, 255))
-                screen.blit(shield_text, (SCREEN_WIDTH - 200, y_offset))
-                y_offset += 25
-                
-            if player_two.has_speed_boost:
-                remaining = max(0, (player_two.speed_boost_timer - current_time) / 1000)
-                speed_text = f.render(f"P2 Speed: {remaining:.1f}s", True, (0, 255, 0))
-                screen.blit(speed_text, (SCREEN_WIDTH - 200, y_offset))
-                y_offset += 25
-                
-            if player_two.has_rapid_fire:
-                remaining = max(0, (player_two.rapid_fire_timer - current_time) / 1000)
-                fire_text = f.render(f"P2 Fire: {remaining:.1f}s", True, (255, 0, 0))
-                screen.blit(fire_text, (SCREEN_WIDTH - 200, y_offset))
+            governor.apply(bg, game.players)
+            # Low-latency mode shows the newest step instead of blending towards it
+            interpolation = 1.0 if args.low_latency else accumulator / step_time
+            game.put_on(screen, pygame.time.get_ticks(), interpolation)
+            game.draw_hud(screen)
             
             # Game over state
         elif game_state == GameState.GAME_OVER:
             draw_game_over(screen, winner)
             
         # Update display
-        pygame.display.flip()
-        clock.tick(FPS)
+        if recorder:
+            recorder.capture(screen)
+        screen.present()
+        latency.presented()
+        rates.count("renders")
+        if rates.update():
+            steps, renders = rates.rates.get("steps", 0), rates.rates.get("renders", 0)
+            screen.set_caption(f"Sebastopol - {steps:.0f} steps/s, {renders:.0f} renders/s")
+        if args.low_latency and game_state == GameState.PLAYING:
+            frame_time = clock.tick()  # already paced before sampling
+            governor.observe(frame_time, frame_time - slept * 1000)
+        else:
+            governor.observe(clock.tick(RENDER_FPS), clock.get_rawtime())
         
+    print(f"Loop rates: {rates.report()}")
+    print(latency.report())
+    print(governor.report())
+    if recorder:
+        recorder.close()
+        print(recorder.report())
     pygame.quit()
     sys.exit()
 
@@ -0,0 +1,208 @@
+"""
+Match module for the Sebastopol game.
+Contains the Match class that runs one two-player round on a World.
+"""
+import pygame
+import random
+import zlib
+import units
+import world
+from utils import ResourceManager, SimClock
+from config import *
+
+class Match:
+    """
+    A two-player match: the world, both tanks and their lives.
+    Keeps the per-frame game logic in one place so it can be stepped by the
+    local game loop or replayed by the network rollback session.
+    """
+    def __init__(self, world, pixel_on):
+        self.world = world
+        self.pixel_on = pixel_on
+        self.reset()
+
+    def reset(self):
+        """Put both tanks back at their starting positions with full lives and rebuild the walls."""
+        self.players = [
+            units.TankUnit([[0, 1, 0], [1, 1, 1], [1, 0, 1]], 4 * WORLD_SCALE, 4 * WORLD_SCALE, self.pixel_on),
+            units.TankUnit([[0, 1, 0], [1, 1, 1], [1, 0, 1]], 6 * WORLD_SCALE, 10 * WORLD_SCALE, self.pixel_on)
+        ]
+        self.lives = [PLAYER_LIVES, PLAYER_LIVES]
+        self.world.reset_terrain()
+        self.winner = None
+        self.ended_at = None
+
+    @property
+    def player_one(self):
+        return self.players[0]
+
+    @property
+    def player_two(self):
+        return self.players[1]
+
+    def handle_key(self, player, key, key_up=False):
+        """Pass a key press or release to one player's tank."""
+        tank = self.players[player]
+        if key_up:
+            tank.move(key, controler=player, key_up=True)
+        else:
+            tank.move(key, controler=player, other_tank=self.players[1 - player], world=self.world)
+
+    def save_positions(self):
+        """Remember where everything was before a step, for interpolated drawing."""
+        for tank in self.players:
+            tank.save_position()
+
+    def update(self):
+        """Advance the match by one frame. Returns the winner once there is one."""
+        player_one, player_two = self.players
+        self.world.update(self.players)
+        player_one.update(other_tank=player_two, world=self.world)
+        player_two.update(other_tank=player_one, world=self.world)
+
+        # Check for bullet collisions with each other
+        for bullet1 in player_one.bullets[:]:
+            for bullet2 in player_two.bullets[:]:
+                if bullet1.rect.colliderect(bullet2.rect):
+                    # Remove both bullets when they collide
+                    if bullet1 in player_one.bullets:
+                        player_one.bullets.remove(bullet1)
+                    if bullet2 in player_two.bullets:
+                        player_two.bullets.remove(bullet2)
+                    break
+
+        # Check for hits
+        for player, tank in enumerate(self.players):
+            shooter = self.players[1 - player]
+            hit_bullet = tank.got_shot(shooter.bullets)
+            if hit_bullet:
+                shooter.bullets.remove(hit_bullet)
+                self.lives[player] -= 1
+                if self.lives[player] <= 0 and self.winner is None:
+                    self.winner = 2 - player
+                    self.ended_at = SimClock.now()
+        return self.winner
+
+    def snapshot(self):
+        """Capture everything the simulation depends on, for rollback."""
+        return (
+            [(tank, tank.snapshot()) for tank in self.players],
+            self.world.snapshot(),
+            list(self.lives),
+            self.winner,
+            self.ended_at,
+            random.getstate(),
+        )
+
+    def restore(self, state):
+        """Rewind the match to a snapshot."""
+        players, world, lives, self.winner, self.ended_at, random_state = state
+        self.players = [tank for tank, _ in players]
+        for tank, tank_state in players:
+            tank.restore(tank_state)
+        self.world.restore(world)
+        self.lives = list(lives)
+        random.setstate(random_state)
+
+    def checksum(self):
+        """Cheap fingerprint of the simulation state, used to detect desyncs."""
+        values = list(self.lives)
+        for tank in self.players:
+            values += [tank.x, tank.y, tank.direction_num, len(tank.bullets)]
+            for bullet in tank.bullets:
+                values += [bullet.x, bullet.y]
+        for power_up in self.world.power_ups:
+            values += [power_up.x, power_up.y, power_up.type]
+        values.append(zlib.crc32(self.world.terrain.tobytes()))
+        return zlib.crc32(repr(values).encode())
+
+    def put_on(self, screen, time, interpolation=1.0):
+        """Draw the world and both tanks, blended between the last two steps."""
+        if not self.world.shimmer:
+            self.world.put_on(screen)
+        elif self.world.logical:
+            self.world.put_on_logical(screen, time)
+        else:
+            self.world.put_on(screen)
+            self.world.turbulence(screen, time)
+        for tank in self.players:
+            tank.put_on(screen, interpolation)
+
+    def draw_hud(self, screen):
+        """Draw lives and power-up timers."""
+        player_one, player_two = self.players
+        f = ResourceManager.get_instance().get_font("pixels/PressStart2P-Regular.ttf", 16)
+        lives1 = f.render(f"P1: {'♥' * self.lives[0]}", True, (0, 0, 0))
+        lives2 = f.render(f"P2: {'♥' * self.lives[1]}", True, (0, 0, 0))
+        screen.blit(lives1, (20, 20))
+        screen.blit(lives2, (SCREEN_WIDTH - 120, 20))
+
+        # Draw power-up timers
+        current_time = SimClock.now()
+
+        # Player 1 power-up timers
+        y_offset = 50
+        if player_one.has_shield:
+            remaining = max(0, (player_one.shield_timer - current_time) / 1000)
+            shield_text = f.render(f"P1 Shield: {remaining:.1f}s", True, (0, 0, 255))
+            screen.blit(shield_text, (20, y_offset))
+            y_offset += 25
+
+        if player_one.has_speed_boost:
+            remaining = max(0, (player_one.speed_boost_timer - current_time) / 1000)
+            speed_text = f.render(f"P1 Speed: {remaining:.1f}s", True, (0, 255, 0))
+            screen.blit(speed_text, (20, y_offset))
+            y_offset += 25
+
+        if player_one.has_rapid_fire:
+            remaining = max(0, (player_one.rapid_fire_timer - current_time) / 1000)
+            fire_text = f.render(f"P1 Fire: {remaining:.1f}s", True, (255, 0, 0))
+            screen.blit(fire_text, (20, y_offset))
+
+        # Player 2 power-up timers
+        y_offset = 50
+        if player_two.has_shield:
+            remaining = max(0, (player_two.shield_timer - current_time) / 1000)
+            shield_text = f.render(f"P2 Shield: {remaining:.1f}s", True, (0, 0, 255))
+            screen.blit(shield_text, (SCREEN_WIDTH - 200, y_offset))
+            y_offset += 25
+
+        if player_two.has_speed_boost:
+            remaining = max(0, (player_two.speed_boost_timer - current_time) / 1000)
+            speed_text = f.render(f"P2 Speed: {remaining:.1f}s", True, (0, 255, 0))
+            screen.blit(speed_text, (SCREEN_WIDTH - 200, y_offset))
+            y_offset += 25
+
+        if player_two.has_rapid_fire:
+            remaining = max(0, (player_two.rapid_fire_timer - current_time) / 1000)
+            fire_text = f.render(f"P2 Fire: {remaining:.1f}s", True, (255, 0, 0))
+            screen.blit(fire_text, (SCREEN_WIDTH - 200, y_offset))
+
+def create_world():
+    """The standard battlefield with its background cell sprites."""
+    resource_manager = ResourceManager.get_instance()
+    return world.World(1600 + WORLD_SCALE, 880 + WORLD_SCALE,
+                       resource_manager.get_image('pixels/b0.png'), resource_manager.get_image('pixels/b01.png'))
+
+def create_match(bg=None):
+    """A Match on the standard battlefield (a new one unless given)."""
+    if bg is None:
+        bg = create_world()
+    return Match(bg, ResourceManager.get_instance().get_image('pixels/b1.png'))
+
+def ai_step(game, director):
+    """
+    Advance a computer-vs-computer match by one simulation step, for headless
+    harnesses: starts the next round once one is won and hands both tanks to
+    the director. Returns the winner, if the step ended the round.
+    """
+    if game.winner is not None:
+        game.reset()
+        director.reset()
+    if not director.controllers:
+        director.add(game.player_one, controler=0, enemy=game.player_two)
+        director.add(game.player_two, controler=1, enemy=game.player_one)
+    SimClock.advance(1000 / FPS)
+    game.save_positions()
+    director.drive(game)
+    return game.update()
@@ -0,0 +1,382 @@
+"""
+Netplay module for the Sebastopol game.
+Contains the UDP transport and rollback session for two-player network matches.
+
+Run one process per player, e.g. on localhost:
+    python netplay.py --player 0 --port 7000 --peer 127.0.0.1:7001
+    python netplay.py --player 1 --port 7001 --peer 127.0.0.1:7000
+
+Check that peers stay in sync (add --start-delay 20 to one of them to check
+a peer that joins late):
+    python netplay.py --player 0 --port 7000 --peer 127.0.0.1:7001 --bot --headless --frames 450 --latency 60 --jitter 20 --loss 0.1
+    python netplay.py --player 1 --port 7001 --peer 127.0.0.1:7000 --bot --headless --frames 450 --latency 60 --jitter 20 --loss 0.1
+"""
+import pygame
+import argparse
+import random
+import socket
+import struct
+import time
+import match
+import render
+from units import TankUnit
+from utils import SimClock
+from config import *
+
+# Input bitfield: one press bit per control (left, right, up, down, fire)
+# followed by one release bit per movement key.
+PRESS_BITS = 5
+RELEASE_SHIFT = 5
+
+# Packet layout: header followed by run-length encoded inputs
+HEADER = struct.Struct("!BIIIIB")  # player, first frame, ack, checksum frame, checksum, run count
+RUN = struct.Struct("!BH")  # repeat count, input bits
+MAX_RUNS = 255
+MAX_RUN_LENGTH = 255
+MAX_SEND_FRAMES = 120
+NO_FRAME = 0xFFFFFFFF
+
+def encode_event(event):
+    """Map a local key event to its input bits, accepting either player's keys."""
+    for keys in TankUnit.CONTROLS:
+        if event.key in keys:
+            index = keys.index(event.key)
+            if event.type == pygame.KEYDOWN:
+                return 1 << index
+            if index < 4:
+                return 1 << (RELEASE_SHIFT + index)
+    return 0
+
+def apply_input(game, player, bits):
+    """Replay one player's input bits for a frame as key releases and presses."""
+    keys = TankUnit.CONTROLS[player]
+    for index in range(4):
+        if bits & (1 << (RELEASE_SHIFT + index)):
+            game.handle_key(player, keys[index], key_up=True)
+    for index in range(PRESS_BITS):
+        if bits & (1 << index):
+            game.handle_key(player, keys[index])
+
+def encode_inputs(inputs):
+    """Run-length encode a list of input bitfields. Idle play compresses to a few bytes."""
+    runs = []
+    for bits in inputs:
+        if runs and runs[-1][1] == bits and runs[-1][0] < MAX_RUN_LENGTH:
+            runs[-1][0] += 1
+        else:
+            runs.append([1, bits])
+    return runs[:MAX_RUNS]
+
+def decode_inputs(runs):
+    """Expand run-length encoded inputs back to a list of bitfields."""
+    inputs = []
+    for count, bits in runs:
+        inputs.extend([bits] * count)
+    return inputs
+
+def pack(player, first_frame, ack, checksum_frame, checksum, inputs):
+    """Build a datagram carrying every input the peer has not acknowledged yet."""
+    runs = encode_inputs(inputs)
+    payload = [HEADER.pack(player, first_frame, ack & NO_FRAME, checksum_frame & NO_FRAME, checksum, len(runs))]
+    payload += [RUN.pack(count, bits) for count, bits in runs]
+    return b"".join(payload)
+
+def unpack(data):
+    """Parse a datagram into (player, first frame, ack, checksum frame, checksum, inputs)."""
+    player, first_frame, ack, checksum_frame, checksum, count = HEADER.unpack_from(data)
+    runs = [RUN.unpack_from(data, HEADER.size + i * RUN.size) for i in range(count)]
+    ack = -1 if ack == NO_FRAME else ack
+    checksum_frame = -1 if checksum_frame == NO_FRAME else checksum_frame
+    return player, first_frame, ack, checksum_frame, checksum, decode_inputs(runs)
+
+class UdpTransport:
+    """
+    Non-blocking UDP socket with optional artificial latency, jitter and loss,
+    so two processes on one machine behave like a real connection.
+    """
+    def __init__(self, port, peer, latency=0, jitter=0, loss=0.0, seed=None):
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind(("0.0.0.0", port))
+        self.socket.setblocking(False)
+        self.peer = peer
+        self.latency = latency / 1000
+        self.jitter = jitter / 1000
+        self.loss = loss
+        self.random = random.Random(seed)  # separate from the game's random state
+        self.outgoing = []  # (send time, payload)
+        self.bytes_sent = 0
+        self.packets_sent = 0
+        self.packets_dropped = 0
+
+    def send(self, payload):
+        """Queue a datagram, dropping it if loss is simulated."""
+        if self.random.random() < self.loss:
+            self.packets_dropped += 1
+            return
+        delay = self.latency + self.random.uniform(0, self.jitter)
+        self.outgoing.append((time.perf_counter() + delay, payload))
+        self.flush()
+
+    def flush(self):
+        """Send every queued datagram whose artificial delay has passed."""
+        now = time.perf_counter()
+        pending = []
+        for due, payload in self.outgoing:
+            if due > now:
+                pending.append((due, payload))
+                continue
+            try:
+                self.socket.sendto(payload, self.peer)
+                self.bytes_sent += len(payload)
+                self.packets_sent += 1
+            except OSError:
+                pass  # peer not listening yet
+        self.outgoing = pending
+
+    def receive(self):
+        """Return all datagrams waiting on the socket."""
+        self.flush()
+        packets = []
+        while True:
+            try:
+                data, _ = self.socket.recvfrom(2048)
+            except (BlockingIOError, ConnectionResetError):
+                return packets
+            packets.append(data)
+
+    def close(self):
+        self.socket.close()
+
+class RollbackSession:
+    """
+    Runs a Match in lockstep with a remote peer without waiting for its input.
+    Remote input is predicted; when the real input arrives and differs, the match
+    is restored to the snapshot of that frame and resimulated up to the present.
+    """
+    def __init__(self, game, transport, player, input_delay=NET_INPUT_DELAY,
+                 max_rollback=NET_MAX_ROLLBACK):
+        self.game = game
+        self.transport = transport
+        self.player = player
+        self.input_delay = input_delay
+        self.max_rollback = max_rollback
+        self.frame = 0  # next frame to simulate
+        self.local_inputs = {}
+        self.remote_inputs = {}
+        self.used_inputs = {}  # remote input each frame was simulated with
+        self.remote_frame = -1  # last frame with confirmed remote input
+        self.remote_ack = -1  # last local frame the peer has confirmed
+        self.verified_frame = -1  # last frame simulated with confirmed input
+        self.snapshots = {}
+        self.checksums = {}
+        self.remote_checksum = (-1, 0)
+        self.pending_bits = 0
+        self.stop_at = None  # frame to stop simulating at, if any
+
+        # Statistics
+        self.rollbacks = 0
+        self.resimulated_frames = 0
+        self.resimulation_time = 0.0
+        self.max_resimulation_time = 0.0
+        self.stalls = 0
+        self.desyncs = 0
+
+    def add_local_event(self, event):
+        """Record a local key event for the next frame."""
+        self.pending_bits |= encode_event(event)
+
+    def poll(self):
+        """Read incoming inputs and acknowledgements from the peer."""
+        for data in self.transport.receive():
+            try:
+                player, first_frame, ack, checksum_frame, checksum, inputs = unpack(data)
+            except struct.error:
+                continue
+            if player == self.player:
+                continue
+            for offset, bits in enumerate(inputs):
+                self.remote_inputs.setdefault(first_frame + offset, bits)
+            while self.remote_frame + 1 in self.remote_inputs:
+                self.remote_frame += 1
+            self.remote_ack = max(self.remote_ack, ack)
+            if checksum_frame > self.remote_checksum[0]:
+                self.remote_checksum = (checksum_frame, checksum)
+                local = self.checksums.get(checksum_frame)
+                if local is not None and local != checksum:
+                    self.desyncs += 1
+                    print(f"Desync detected at frame {checksum_frame}")
+
+    def send(self):
+        """Send all local inputs the peer has not acknowledged yet."""
+        first = self.remote_ack + 1
+        last = min(max(self.local_inputs, default=-1), first + MAX_SEND_FRAMES - 1)
+        inputs = [self.local_inputs.get(frame, 0) for frame in range(first, last + 1)]
+        checksum_frame = max(self.checksums) if self.checksums else -1
+        packet = pack(self.player, first, self.remote_frame, checksum_frame,
+                      self.checksums.get(checksum_frame, 0), inputs)
+        self.transport.send(packet)
+
+    def simulate(self, frame):
+        """Save a snapshot, then run one frame with the best known inputs."""
+        self.snapshots[frame] = self.game.snapshot()
+        if frame - 1 <= self.remote_frame and frame % NET_CHECKSUM_INTERVAL == 0:
+            self.checksums[frame] = self.game.checksum()
+        remote = self.remote_inputs.get(frame, 0)  # predict no new presses
+        self.used_inputs[frame] = remote
+        inputs = [0, 0]
+        inputs[self.player] = self.local_inputs.get(frame, 0)
+        inputs[1 - self.player] = remote
+
+        SimClock.set(frame * 1000 // FPS)
+        if self.game.winner is not None and SimClock.now() - self.game.ended_at >= NET_RESTART_DELAY:
+            self.game.reset()
+        for player, bits in enumerate(inputs):
+            apply_input(self.game, player, bits)
+        self.game.update()
+
+    def rollback(self):
+        """Resimulate from the first frame whose predicted input was wrong."""
+        last = min(self.remote_frame, self.frame - 1)
+        first_wrong = None
+        for frame in range(self.verified_frame + 1, last + 1):
+            if self.used_inputs.get(frame) != self.remote_inputs[frame]:
+                first_wrong = frame
+                break
+        self.verified_frame = max(self.verified_frame, last)
+        if first_wrong is None:
+            return
+
+        start = time.perf_counter()
+        self.game.restore(self.snapshots[first_wrong])
+        for frame in range(first_wrong, self.frame):
+            self.simulate(frame)
+        elapsed = time.perf_counter() - start
+        self.rollbacks += 1
+        self.resimulated_frames += self.frame - first_wrong
+        self.resimulation_time += elapsed
+        self.max_resimulation_time = max(self.max_resimulation_time, elapsed)
+
+    def advance(self):
+        """Run one network tick: exchange inputs, roll back if needed, step the match."""
+        self.poll()
+        self.rollback()
+
+        if self.stop_at is not None and self.frame >= self.stop_at:
+            pass
+        elif self.frame - self.remote_frame > self.max_rollback:
+            # Too far ahead of the peer to predict safely; wait for it
+            self.stalls += 1
+        else:
+            self.local_inputs[self.frame + self.input_delay] = self.pending_bits
+            self.pending_bits = 0
+            self.simulate(self.frame)
+            self.frame += 1
+            self.forget(self.frame - self.max_rollback - 1)
+        self.send()
+
+    def forget(self, before):
+        """Drop history that can no longer be rolled back to or resent."""
+        oldest = min(before, self.verified_frame + 1)
+        for history in (self.snapshots, self.used_inputs, self.remote_inputs):
+            for frame in [frame for frame in history if frame < oldest]:
+                del history[frame]
+        # A local input can only go once the peer has it and no rollback can replay it
+        sent = min(self.remote_ack, self.verified_frame)
+        for frame in [frame for frame in self.local_inputs if frame <= sent]:
+            del self.local_inputs[frame]
+        for frame in [frame for frame in self.checksums if frame < oldest - NET_CHECKSUM_INTERVAL * 4]:
+            del self.checksums[frame]
+
+    def report(self):
+        """One-line summary of the rollback statistics."""
+        frames = max(1, self.frame)
+        per_frame = self.resimulation_time / frames * 1000
+        return (f"frame {self.frame} | rollbacks {self.rollbacks} | "
+                f"resimulated {self.resimulated_frames} frames | "
+                f"resim cost {per_frame:.3f} ms/frame avg, {self.max_resimulation_time * 1000:.2f} ms max | "
+                f"stalls {self.stalls} | desyncs {self.desyncs} | "
+                f"sent {self.transport.bytes_sent} B in {self.transport.packets_sent} packets, "
+                f"{self.transport.packets_dropped} dropped")
+
+def parse_args(argv=None):
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Sebastopol network play")
+    parser.add_argument("--player", type=int, choices=(0, 1), required=True, help="which tank this peer drives")
+    parser.add_argument("--port", type=int, required=True, help="local UDP port")
+    parser.add_argument("--peer", required=True, help="remote host:port")
+    parser.add_argument("--input-delay", type=int, default=NET_INPUT_DELAY, help="frames of local input delay")
+    parser.add_argument("--latency", type=int, default=0, help="artificial one-way latency in ms")
+    parser.add_argument("--jitter", type=int, default=0, help="artificial latency jitter in ms")
+    parser.add_argument("--loss", type=float, default=0.0, help="artificial packet loss (0-1)")
+    parser.add_argument("--seed", type=int, default=0, help="shared random seed for both peers")
+    parser.add_argument("--bot", action="store_true", help="press random keys instead of reading the keyboard")
+    parser.add_argument("--frames", type=int, default=0, help="stop after this many frames (0 = play until closed)")
+    parser.add_argument("--start-delay", type=int, default=0, help="ticks to wait before joining the match")
+    parser.add_argument("--headless", action="store_true", help="use SDL's dummy video and audio drivers")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Run one peer of a network match."""
+    args = parse_args(argv)
+    if args.headless:
+        import os
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+        os.environ["SDL_AUDIODRIVER"] = "dummy"
+    host, port = args.peer.rsplit(":", 1)
+
+    pygame.init()
+    screen = render.create_renderer(RENDERER, (SCREEN_WIDTH, SCREEN_HEIGHT), f"Sebastopol - Player {args.player + 1}")
+    clock = pygame.time.Clock()
+
+    # Both peers must start from identical state
+    random.seed(args.seed)
+    SimClock.set(0)
+    game = match.create_match()
+
+    # Joining late: the peer runs ahead on predicted input until we show up
+    time.sleep(args.start_delay / FPS)
+    transport = UdpTransport(args.port, (host, int(port)), args.latency, args.jitter, args.loss,
+                             seed=args.seed * 2 + args.player)
+    session = RollbackSession(game, transport, args.player, args.input_delay)
+    session.stop_at = args.frames or None
+    bot = random.Random(args.seed * 2 + args.player + 1)
+    last_report = time.perf_counter()
+
+    running = True
+    while running:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type in (pygame.KEYDOWN, pygame.KEYUP) and not args.bot:
+                session.add_local_event(event)
+        if args.bot and bot.random() < 0.2:
+            session.pending_bits |= 1 << bot.randrange(PRESS_BITS)
+
+        session.advance()
+        if args.frames and session.verified_frame >= args.frames - 1:
+            running = False
+
+        game.put_on(screen, pygame.time.get_ticks())
+        game.draw_hud(screen)
+        screen.present()
+
+        if time.perf_counter() - last_report >= 1:
+            print(session.report())
+            last_report = time.perf_counter()
+        clock.tick(FPS)
+
+    # Keep answering for a moment so the peer can confirm its last frames
+    linger = time.perf_counter() + 1
+    while time.perf_counter() < linger:
+        session.poll()
+        session.send()
+        time.sleep(1 / FPS)
+
+    print(session.report())
+    if args.frames:
+        print(f"checksum at frame {session.frame}: {game.checksum():08x}")
+    transport.close()
+    pygame.quit()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Observation module for the Sebastopol game.
+Contains the Observer that turns the game into NumPy arrays for bots and
+training agents, either from the rendered frame or from the game objects.
+
+Benchmark the per-step cost of both modes (headless):
+    python observe.py --steps 2000
+"""
+import contextlib
+import numpy as np
+import pygame
+from utils import PowerUp
+from config import *
+
+# Symbolic channels, in plane order. "self" is the observing player.
+CHANNELS = (
+    ["terrain", "self_tank", "enemy_tank", "self_bullets", "enemy_bullets"]
+    + [f"power_up_{power_type}" for power_type in PowerUp.TYPES]
+    + ["shield", "speed_boost", "rapid_fire"]
+)
+
+class Observer:
+    """
+    Observations on the World cell grid.
+
+    pixels() yields the rendered frame sampled at the centre of every cell: a
+    strided view into the display surface from pygame.surfarray.pixels3d, so
+    nothing is copied. symbolic() fills preallocated uint8 planes, one per
+    entry of CHANNELS, from the live tanks, bullets and power-ups.
+
+    Both are indexed [row, col] on the same cells, but the screen only shows
+    the top-left corner of the world: the pixel grid is the screen's (50x50
+    cells at 800x800), the symbolic grid the whole world's (101x56). Pixel
+    cell [r, c] is symbolic cell [:, r, c].
+    """
+    def __init__(self, world):
+        self.world = world
+        self.rows, self.cols = world.terrain.shape
+        self.planes = np.zeros((len(CHANNELS), self.rows, self.cols), dtype=np.uint8)
+        self.channel = {name: i for i, name in enumerate(CHANNELS)}
+        self._readback = None  # frame copy for renderers without a display surface
+
+    @contextlib.contextmanager
+    def pixels(self, screen):
+        """
+        Yield the frame as a (rows, cols, 3) uint8 view, one RGB sample per cell
+        of the screen (not the whole world, see the class docstring). The view locks the surface it looks into until every
+        reference to it is gone: use it (or copy it) inside the with block and
+        don't keep it, or the next frame can't be drawn.
+        """
+        surface = getattr(screen, "surface", None)
+        if surface is None:
+            # Texture renderer: the frame lives on the GPU, read it back once
+            if self._readback is None or self._readback.get_size() != screen.get_size():
+                self._readback = pygame.Surface(screen.get_size(), 0, 32)
+            screen.read_pixels(self._readback)
+            surface = self._readback
+        frame = pygame.surfarray.pixels3d(surface)
+        try:
+            centre = WORLD_SCALE // 2
+            # surfarray is indexed [x, y]; swapping the axes is still a view
+            yield frame[centre::WORLD_SCALE, centre::WORLD_SCALE].transpose(1, 0, 2)
+        finally:
+            del frame  # unlocks the surface
+
+    def mark(self, channel, obj, size=1, value=1):
+        """Set the size x size cells from an object's top-left cell, clipped to the grid."""
+        col, row = int(obj.x) // WORLD_SCALE, int(obj.y) // WORLD_SCALE
+        if col + size <= 0 or row + size <= 0:
+            return
+        self.planes[channel, max(row, 0):row + size, max(col, 0):col + size] = value
+
+    def symbolic(self, players, player=0):
+        """
+        Fill and return the (channels, rows, cols) planes as seen by one player.
+        The array is reused on every call; copy it to keep an observation.
+        """
+        planes = self.planes
+        planes.fill(0)
+        np.copyto(planes[0], self.world.terrain)
+        c = self.channel
+
+        me, enemy = players[player], players[1 - player]
+        self.mark(c["self_tank"], me, 3)
+        self.mark(c["enemy_tank"], enemy, 3)
+        for bullet in me.bullets:
+            self.mark(c["self_bullets"], bullet)
+        for bullet in enemy.bullets:
+            self.mark(c["enemy_bullets"], bullet)
+        for power_up in self.world.power_ups:
+            if power_up.active:
+                self.mark(c[f"power_up_{power_up.type}"], power_up)
+
+        # Power-up flags over the footprint of the tank that has them
+        for tank in players:
+            if tank.has_shield:
+                self.mark(c["shield"], tank, 3)
+            if tank.has_speed_boost:
+                self.mark(c["speed_boost"], tank, 3)
+            if tank.has_rapid_fire:
+                self.mark(c["rapid_fire"], tank, 3)
+        return planes
+
+def benchmark(steps):
+    """Play an AI-vs-AI match and time both observation modes against a plain screenshot."""
+    import io
+    import time
+    import random
+    import match
+    import render
+    import ai
+    from utils import SimClock
+
+    random.seed(0)
+    pygame.init()
+    screen = render.create_renderer("surface", (SCREEN_WIDTH, SCREEN_HEIGHT))
+    with contextlib.redirect_stdout(io.StringIO()):
+        game = match.create_match()
+        bg = game.world
+    director = ai.AIDirector(bg)
+    observer = Observer(bg)
+    SimClock.set(0)
+
+    times = {"symbolic": [], "pixels": [], "screenshot copy": []}
+    quiet = io.StringIO()
+    for step in range(steps):
+        with contextlib.redirect_stdout(quiet):
+            match.ai_step(game, director)
+            game.put_on(screen, SimClock.now())
+        quiet.seek(0)
+        quiet.truncate()
+
+        start = time.perf_counter()
+        planes = observer.symbolic(game.players)
+        times["symbolic"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        with observer.pixels(screen) as cells:
+            brightness = int(cells.max())  # read the data, as a consumer would
+            del cells  # let go of the view so the surface can be drawn on again
+        times["pixels"].append(time.perf_counter() - start)
+
+        # What the pixel mode avoids: copying the whole frame, then sampling it
+        start = time.perf_counter()
+        frame = pygame.surfarray.array3d(screen.surface)
+        copied = frame[WORLD_SCALE // 2::WORLD_SCALE, WORLD_SCALE // 2::WORLD_SCALE].transpose(1, 0, 2).copy()
+        times["screenshot copy"].append(time.perf_counter() - start)
+        screen.present()
+
+    pygame.quit()
+    print(f"Observation cost over {steps} steps (grid {observer.cols}x{observer.rows}, "
+          f"{len(CHANNELS)} symbolic planes, {planes.nbytes} bytes):")
+    for name, samples in times.items():
+        samples = sorted(samples)
+        mean = sum(samples) / len(samples)
+        print(f"  {name:<16}{mean * 1e6:8.1f} us mean {samples[int(len(samples) * 0.99)] * 1e6:8.1f} us p99")
+
+if __name__ == '__main__':
+    import os
+    import argparse
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    parser = argparse.ArgumentParser(description="Observation benchmark")
+    parser.add_argument("--steps", type=int, default=2000)
+    benchmark(parser.parse_args().steps)
@@ -0,0 +1,86 @@
+"""
+Quality module for the Sebastopol game.
+Contains the governor that trades visual effects for frame time.
+"""
+import collections
+from config import *
+
+class QualityGovernor:
+    """
+    Watches a rolling window of work times (frame time minus the frame-rate
+    sleep) and steps the QUALITY_LEVELS down when the average misses the
+    budget, or up when it leaves plenty of headroom. Frame time itself would
+    make a loop paced at exactly the budget, like the low-latency mode, look
+    overloaded. A hold period after each change, plus the gap between the two
+    thresholds, keeps it from flip-flopping between levels.
+    """
+    def __init__(self, levels=QUALITY_LEVELS, quality=QUALITY, budget=QUALITY_FRAME_BUDGET,
+                 window=QUALITY_WINDOW):
+        self.levels = levels
+        self.names = [level["name"] for level in levels]
+        self.adaptive = quality == "auto"
+        self.level = len(levels) - 1 if self.adaptive else self.names.index(quality)
+        self.budget = budget
+        self.work_times = collections.deque(maxlen=window)
+        self.hold = 0
+        self.changes = 0
+        self.time_at_level = dict.fromkeys(self.names, 0.0)  # seconds
+
+    @property
+    def settings(self):
+        return self.levels[self.level]
+
+    @property
+    def level_name(self):
+        return self.names[self.level]
+
+    def observe(self, frame_time, work_time=None):
+        """
+        Feed one frame's duration (clock.tick) and work time (clock.get_rawtime),
+        in ms. Only the work time decides the level.
+        """
+        self.time_at_level[self.level_name] += frame_time / 1000
+        self.work_times.append(frame_time if work_time is None else work_time)
+        if self.hold:
+            self.hold -= 1
+            return
+        if not self.adaptive or len(self.work_times) < self.work_times.maxlen:
+            return
+
+        average_work = sum(self.work_times) / len(self.work_times)
+        if average_work > self.budget and self.level > 0:
+            self.set_level(self.level - 1)
+        elif average_work < self.budget * QUALITY_HEADROOM and self.level < len(self.levels) - 1:
+            self.set_level(self.level + 1)
+
+    def set_level(self, level):
+        """Switch level and start a fresh window."""
+        print(f"Quality: {self.level_name} -> {self.names[level]}")
+        self.level = level
+        self.changes += 1
+        self.hold = QUALITY_HOLD
+        self.work_times.clear()
+
+    def apply(self, world, tanks):
+        """Configure the world and tanks for the current level."""
+        settings = self.settings
+        world.logical = settings["logical"]
+        world.shimmer = settings["shimmer"]
+        world.shimmer_interval = settings["shimmer_interval"]
+        for tank in tanks:
+            tank.trail_drawn = settings["trail"]
+            tank.shake_enabled = settings["shake"]
+            tank.shield_drawn = settings["shield"]
+
+    def telemetry(self):
+        """Current level, number of changes and seconds spent at each level."""
+        return {
+            "level": self.level_name,
+            "changes": self.changes,
+            "time_at_level": dict(self.time_at_level),
+        }
+
+    def report(self):
+        """One-line summary for the console."""
+        times = ", ".join(f"{name} {seconds:.1f}s" for name, seconds in self.time_at_level.items())
+        return f"Quality: {self.level_name} now, {self.changes} changes, time at level: {times}"
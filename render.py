@@ -0,0 +1,360 @@
+"""
+Render module for the Sebastopol game.
+Contains the display backends the game draws through: the classic software
+Surface path and an SDL2 texture renderer built on pygame._sdl2.video.
+
+Benchmark both backends (headless, SDL software renderer):
+    python render.py --frames 120 [--logical]
+"""
+import pygame
+import weakref
+import sys
+import time
+from config import *
+
+# SDL_BlendMode values for Texture.blend_mode
+BLENDMODE_NONE = 0
+BLENDMODE_BLEND = 1
+
+def is_opaque(surface):
+    """True if every pixel of a per-pixel alpha surface is fully opaque."""
+    width, height = surface.get_size()
+    return pygame.mask.from_surface(surface, 254).count() == width * height
+
+class SurfaceRenderer:
+    """
+    Draws with software Surface blits onto the display surface.
+    """
+    name = "surface"
+
+    def __init__(self, size, caption="Sebastopol"):
+        self.surface = pygame.display.set_mode(size)
+        pygame.display.set_caption(caption)
+        self._faded = weakref.WeakKeyDictionary()  # reusable copies for alpha blits
+        self._scaled = None  # scratch surface for blit_scaled
+
+    def faded(self, source):
+        """Reusable copy of a surface whose per-surface alpha can be changed freely."""
+        faded = self._faded.get(source)
+        if faded is None:
+            faded = self._faded[source] = source.copy()
+        return faded
+
+    def blit(self, source, dest, alpha=None):
+        """Draw a surface at a position or rect, optionally with extra transparency."""
+        if alpha is not None:
+            source = self.faded(source)
+            source.set_alpha(max(0, min(255, alpha)))
+        return self.surface.blit(source, dest)
+
+    def blits(self, source, positions, alphas):
+        """Draw one surface at many positions, each with its own alpha (0-255)."""
+        faded = self.faded(source)
+        set_alpha = faded.set_alpha
+        blit = self.surface.blit
+        for position, alpha in zip(positions, alphas):
+            set_alpha(alpha)
+            blit(faded, position)
+
+    def blit_scaled(self, source, rect):
+        """Draw a surface stretched to a rect with nearest-neighbour scaling."""
+        if rect.topleft == (0, 0) and rect.size == self.surface.get_size():
+            pygame.transform.scale(source, rect.size, self.surface)
+            return
+        if self._scaled is None or self._scaled.get_size() != rect.size:
+            self._scaled = pygame.Surface(rect.size, 0, self.surface)
+        pygame.transform.scale(source, rect.size, self._scaled)
+        self.surface.blit(self._scaled, rect)
+
+    def update_region(self, source, rect):
+        """Part of a surface has been drawn on; display blits read it directly."""
+        self._faded.pop(source, None)
+
+    def fill(self, color):
+        self.surface.fill(color)
+
+    def get_width(self):
+        return self.surface.get_width()
+
+    def get_height(self):
+        return self.surface.get_height()
+
+    def get_size(self):
+        return self.surface.get_size()
+
+    def set_caption(self, caption):
+        pygame.display.set_caption(caption)
+
+    def read_pixels(self, target):
+        """Copy the frame drawn so far into a surface of the same size."""
+        target.blit(self.surface, (0, 0))
+
+    def present(self):
+        """Show the finished frame."""
+        pygame.display.flip()
+
+class TextureRenderer:
+    """
+    Draws through an SDL2 Renderer. Every surface is uploaded once as a texture
+    (cached until the surface is garbage collected) and transparency is applied
+    with texture alpha modulation, so drawing never copies surfaces.
+    """
+    name = "texture"
+
+    def __init__(self, size, caption="Sebastopol", software=False):
+        from pygame._sdl2 import video
+        self._video = video
+        self.window = video.Window(caption, size)
+        self.renderer = video.Renderer(self.window, accelerated=0 if software else -1)
+        self.size = size
+        self._textures = weakref.WeakKeyDictionary()
+        self._opaque = weakref.WeakSet()  # sources uploaded without an alpha channel
+
+    def texture(self, source):
+        """Texture for a surface, uploading it on first use."""
+        texture = self._textures.get(source)
+        if texture is None:
+            upload = source
+            if source.get_flags() & pygame.SRCALPHA and is_opaque(source):
+                # Without an alpha channel, unfaded draws are plain copies
+                upload = pygame.Surface(source.get_size(), 0, 32)
+                upload.blit(source, (0, 0))
+                self._opaque.add(source)
+            texture = self._textures[source] = self._video.Texture.from_surface(self.renderer, upload)
+        return texture
+
+    def set_alpha(self, source, texture, alpha):
+        """Set a texture's alpha modulation. Opaque uploads have blending off, so turn it on while faded."""
+        texture.alpha = alpha
+        if source in self._opaque:
+            texture.blend_mode = BLENDMODE_BLEND if alpha < 255 else BLENDMODE_NONE
+
+    def blit_scaled(self, source, rect):
+        """Draw a surface stretched to a rect; the GPU (or SDL) does the scaling."""
+        texture = self._textures.get(source)
+        if texture is None:
+            texture = self._textures[source] = self._video.Texture.from_surface(self.renderer, source)
+        else:
+            texture.update(source)  # the source is redrawn every frame
+        texture.draw(dstrect=rect)
+
+    def update_region(self, source, rect):
+        """Re-upload just the part of a surface that has been drawn on since upload."""
+        texture = self._textures.get(source)
+        if texture is not None:
+            texture.update(source.subsurface(rect), rect)
+
+    def blit(self, source, dest, alpha=None):
+        """Draw a surface at a position or rect, optionally with extra transparency."""
+        texture = self.texture(source)
+        rect = pygame.Rect(dest[0], dest[1], texture.width, texture.height)
+        self.set_alpha(source, texture, 255 if alpha is None else max(0, min(255, alpha)))
+        texture.draw(dstrect=rect)
+        return rect
+
+    def blits(self, source, positions, alphas):
+        """Draw one surface at many positions, each with its own alpha (0-255)."""
+        texture = self.texture(source)
+        width, height = texture.width, texture.height
+        draw = texture.draw
+        self.set_alpha(source, texture, 0)  # blending on for the whole batch
+        for (x, y), alpha in zip(positions, alphas):
+            texture.alpha = alpha
+            draw(dstrect=(x, y, width, height))
+        self.set_alpha(source, texture, 255)
+
+    def fill(self, color):
+        self.renderer.draw_color = pygame.Color(color)
+        self.renderer.clear()
+
+    def get_width(self):
+        return self.size[0]
+
+    def get_height(self):
+        return self.size[1]
+
+    def get_size(self):
+        return self.size
+
+    def set_caption(self, caption):
+        self.window.title = caption
+
+    def read_pixels(self, target):
+        """Copy the frame drawn so far (before present) into a surface of the same size."""
+        self.renderer.to_surface(target)
+
+    def present(self):
+        """Show the finished frame."""
+        self.renderer.present()
+
+class BlitTracer:
+    """
+    Diagnostic wrapper around a renderer that records every blit by call site:
+    call count, pixel area, time spent, and the source pixel format compared with
+    the display's. print_report() ranks the call sites by total time and flags
+    surfaces that force slow conversions or are recreated for every blit.
+    """
+    def __init__(self, renderer):
+        self.renderer = renderer
+        self.display = getattr(renderer, "surface", None)
+        self.display_format = "texture renderer"
+        if self.display is not None:
+            kind = "RGBA" if self.display.get_flags() & pygame.SRCALPHA else "RGB"
+            self.display_format = f"{self.display.get_bitsize()}bpp {kind}"
+        self.sites = {}
+        self.frames = 0
+        self._seen = weakref.WeakKeyDictionary()  # sources already blitted, per site
+        self._opaque = weakref.WeakKeyDictionary()
+
+    def __getattr__(self, name):
+        return getattr(self.renderer, name)
+
+    def call_site(self):
+        """Name of the method that asked for the blit, e.g. 'TankUnit.put_on:312'."""
+        frame = sys._getframe(2)
+        owner = frame.f_locals.get("self")
+        name = frame.f_code.co_name
+        if owner is not None:
+            name = f"{type(owner).__name__}.{name}"
+        return f"{name}:{frame.f_lineno}"
+
+    def describe(self, source, alpha):
+        """Short description of the source format and the problems it causes."""
+        per_pixel = bool(source.get_flags() & pygame.SRCALPHA)
+        notes = []
+        if self.display is not None and (source.get_bitsize() != self.display.get_bitsize()
+                                         or source.get_masks()[:3] != self.display.get_masks()[:3]):
+            notes.append("CONVERT")  # converted pixel by pixel on every blit
+        if per_pixel:
+            opaque = self._opaque.get(source)
+            if opaque is None:
+                opaque = self._opaque[source] = is_opaque(source)
+            if opaque:
+                notes.append("OPAQUE-SRCALPHA")  # blended although nothing shows through
+        if alpha is not None or (source.get_alpha() not in (None, 255) and not per_pixel):
+            notes.append("SURFACE-ALPHA")
+        kind = "RGBA" if per_pixel else "RGB"
+        return f"{source.get_bitsize()}bpp {kind}", notes
+
+    def record(self, site, source, count, area, elapsed, alpha=None):
+        fmt, notes = self.describe(source, alpha)
+        stats = self.sites.get(site)
+        if stats is None:
+            stats = self.sites[site] = {"calls": 0, "pixels": 0, "time": 0.0, "new": 0,
+                                        "format": fmt, "notes": set()}
+        stats["calls"] += count
+        stats["pixels"] += area * count
+        stats["time"] += elapsed
+        stats["notes"].update(notes)
+        seen = self._seen.setdefault(source, set())
+        if site not in seen:
+            seen.add(site)
+            stats["new"] += 1
+
+    def blit(self, source, dest, alpha=None):
+        start = time.perf_counter()
+        result = self.renderer.blit(source, dest, alpha=alpha)
+        elapsed = time.perf_counter() - start
+        width, height = source.get_size()
+        self.record(self.call_site(), source, 1, width * height, elapsed, alpha)
+        return result
+
+    def blits(self, source, positions, alphas):
+        start = time.perf_counter()
+        self.renderer.blits(source, positions, alphas)
+        elapsed = time.perf_counter() - start
+        width, height = source.get_size()
+        self.record(self.call_site(), source, len(positions), width * height, elapsed, alphas)
+
+    def blit_scaled(self, source, rect):
+        start = time.perf_counter()
+        self.renderer.blit_scaled(source, rect)
+        elapsed = time.perf_counter() - start
+        self.record(self.call_site(), source, 1, rect.width * rect.height, elapsed)
+
+    def present(self):
+        self.frames += 1
+        self.renderer.present()
+
+    def print_report(self):
+        """Print call sites ranked by the time their blits took."""
+        frames = max(1, self.frames)
+        print(f"\nBlit report over {self.frames} frames (display: {self.display_format})")
+        print(f"{'call site':34} {'calls/frame':>11} {'Mpx/frame':>9} {'ms/frame':>8} {'us/call':>8} "
+              f"{'sources':>7}  format / notes")
+        ranked = sorted(self.sites.items(), key=lambda item: item[1]["time"], reverse=True)
+        for site, stats in ranked:
+            notes = list(stats["notes"])
+            if stats["new"] > 1 and stats["new"] >= stats["calls"] * 0.5:
+                notes.append("NEW-SURFACE-PER-CALL")  # worth caching
+            print(f"{site:34} {stats['calls'] / frames:11.1f} {stats['pixels'] / frames / 1e6:9.3f} "
+                  f"{stats['time'] / frames * 1000:8.3f} {stats['time'] / stats['calls'] * 1e6:8.2f} "
+                  f"{stats['new']:7}  {stats['format']} {' '.join(sorted(notes))}")
+
+def create_renderer(name, size, caption="Sebastopol", software=False):
+    """Create the requested backend, falling back to Surface blits if SDL2 rendering is unavailable."""
+    if name == "texture":
+        try:
+            return TextureRenderer(size, caption, software)
+        except (ImportError, pygame.error) as e:
+            print(f"Texture renderer unavailable, using surface renderer: {e}")
+    return SurfaceRenderer(size, caption)
+
+def benchmark(name, frames, logical=False):
+    """Render a match for a number of frames and return CPU and wall ms per frame."""
+    import time
+    import match
+    from units import TankUnit
+    from utils import SimClock
+
+    pygame.init()
+    screen = create_renderer(name, (SCREEN_WIDTH, SCREEN_HEIGHT), software=True)
+    game = match.create_match()
+    game.world.logical = logical
+    SimClock.set(0)
+
+    # A few moves and shots so trails and bullets get drawn too
+    for player, (left, right, up, down, fire) in enumerate(TankUnit.CONTROLS):
+        for key in (right, right, fire, down, fire):
+            game.handle_key(player, key)
+
+    # Warm up caches before timing
+    game.put_on(screen, 0)
+    screen.present()
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    for frame in range(frames):
+        SimClock.advance(1000 / FPS)
+        game.update()
+        game.put_on(screen, frame * 1000 // FPS)
+        game.draw_hud(screen)
+        screen.present()
+    cpu = (time.process_time() - cpu_start) / frames * 1000
+    wall = (time.perf_counter() - wall_start) / frames * 1000
+    pygame.quit()
+    return screen.name, cpu, wall
+
+if __name__ == '__main__':
+    import argparse
+    import os
+    import subprocess
+    import sys
+
+    parser = argparse.ArgumentParser(description="Compare render backends")
+    parser.add_argument("--frames", type=int, default=120)
+    parser.add_argument("--backend", choices=("surface", "texture"), help="benchmark one backend in this process")
+    parser.add_argument("--logical", action="store_true", help="draw the background at one pixel per cell")
+    args = parser.parse_args()
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+    if args.backend:
+        sys.stdout = open(os.devnull, "w")  # silence the game's debug prints
+        name, cpu, wall = benchmark(args.backend, args.frames, args.logical)
+        sys.stdout = sys.__stdout__
+        mode = " (logical)" if args.logical else ""
+        print(f"{name + mode:18} {cpu:8.2f} ms CPU/frame {wall:8.2f} ms wall/frame")
+    else:
+        # One process per backend: the display module and an SDL2 window don't mix
+        for backend in ("surface", "texture"):
+            command = [sys.executable, __file__, "--backend", backend, "--frames", str(args.frames)]
+            subprocess.run(command + (["--logical"] if args.logical else []))
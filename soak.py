@@ -0,0 +1,101 @@
+"""
+Soak test for the Sebastopol game.
+Plays a long computer-vs-computer match headless under tracemalloc, reports
+where memory was allocated and fails if usage keeps growing after warm-up.
+
+    python soak.py --steps 30000
+"""
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import contextlib
+import random
+import sys
+import time
+import tracemalloc
+import pygame
+import match
+import render
+import ai
+from utils import ResourceManager, SimClock
+from config import *
+
+MEMORY_CEILING = 1024 * 1024  # bytes of growth allowed after warm-up
+
+def run(steps, render_every, warmup, seed):
+    """Play the match and return (warm-up snapshot, final snapshot, samples, peaks)."""
+    random.seed(seed)
+    pygame.init()
+    screen = render.create_renderer("surface", (SCREEN_WIDTH, SCREEN_HEIGHT))
+    game = match.create_match()
+    bg = game.world
+    director = ai.AIDirector(bg)
+    SimClock.set(0)
+
+    warm = None
+    samples = []
+    peaks = {"power_ups": 0, "bullets": 0, "images": 0, "sounds": 0}
+    for step in range(steps):
+        if step == warmup:
+            warm = tracemalloc.take_snapshot()
+
+        match.ai_step(game, director)
+
+        if render_every and step % render_every == 0:
+            pygame.event.pump()
+            game.put_on(screen, SimClock.now())
+            game.draw_hud(screen)
+            screen.present()
+
+        peaks["power_ups"] = max(peaks["power_ups"], len(bg.power_ups))
+        peaks["bullets"] = max(peaks["bullets"], sum(len(tank.bullets) for tank in game.players))
+        peaks["images"] = max(peaks["images"], len(ResourceManager._images))
+        peaks["sounds"] = max(peaks["sounds"], len(ResourceManager._sounds))
+        if step % 1000 == 0:
+            samples.append((step, tracemalloc.get_traced_memory()[0]))
+
+    final = tracemalloc.take_snapshot()
+    pygame.quit()
+    return warm, final, samples, peaks
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Memory soak test")
+    parser.add_argument("--steps", type=int, default=30000, help="simulation steps (30 per second of play)")
+    parser.add_argument("--render-every", type=int, default=10, help="render one frame every N steps (0 = never)")
+    parser.add_argument("--warmup", type=int, default=3000, help="steps before the baseline snapshot")
+    parser.add_argument("--ceiling", type=int, default=MEMORY_CEILING, help="allowed growth after warm-up, in bytes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--top", type=int, default=10, help="allocation hot spots to list")
+    args = parser.parse_args(argv)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    with open(os.devnull, "w") as quiet, contextlib.redirect_stdout(quiet):
+        warm, final, samples, peaks = run(args.steps, args.render_every, args.warmup, args.seed)
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    warm, final = warm.filter_traces(filters), final.filter_traces(filters)
+    growth = sum(stat.size for stat in final.statistics("filename")) - \
+             sum(stat.size for stat in warm.statistics("filename"))
+
+    print(f"Soak: {args.steps} steps ({args.steps / FPS / 60:.1f} min of play) in {elapsed:.1f}s")
+    print(f"Peaks: {peaks}")
+    print("Traced memory (step: KiB): " + ", ".join(f"{step}: {size / 1024:.0f}" for step, size in samples))
+    print(f"Peak traced memory: {peak / 1024:.0f} KiB")
+    print(f"\nTop allocation sites by growth since step {args.warmup}:")
+    for stat in final.compare_to(warm, "lineno")[:args.top]:
+        print(f"  {stat}")
+    print(f"\nGrowth after warm-up: {growth / 1024:.1f} KiB (ceiling {args.ceiling / 1024:.0f} KiB)")
+    if growth > args.ceiling:
+        print("FAIL: memory keeps growing")
+        return 1
+    print("OK")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -5,7 +5,7 @@ Contains classes for tanks, bullets, and related game objects.
 import pygame
 import numpy as np
 import sys
-from utils import GameObject, ResourceManager
+from utils import GameObject, ResourceManager, SimClock, to_display_format
 from config import *
 
 class Bullet(GameObject):
@@ -46,8 +46,33 @@ class Bullet(GameObject):
             self.clock = 0
             self.update_rect()
 
+    def snapshot(self):
+        """Capture the mutable state of the bullet for rollback."""
+        return (self, self.x, self.y, self.clock)
+
+    @staticmethod
+    def restore(state):
+        """Rewind a bullet to a snapshot and return it."""
+        bullet, bullet.x, bullet.y, bullet.clock = state
+        bullet.rect = pygame.Rect(bullet.x, bullet.y, bullet.rect.width, bullet.rect.height)
+        return bullet
+
 class TankUnit(GameObject):
     """Tank unit class for player-controlled vehicles."""
+    # Control keys for each player: left, right, up, down, fire
+    CONTROLS = [
+        [pygame.K_LEFT, pygame.K_RIGHT, pygame.K_UP, pygame.K_DOWN, pygame.K_RSHIFT],
+        [pygame.K_a, pygame.K_d, pygame.K_w, pygame.K_s, pygame.K_e]
+    ]
+    # Attributes that change during play and are saved for rollback
+    SNAPSHOT_FIELDS = (
+        "x", "y", "rect", "direction", "direction_num", "orientations", "orientation",
+        "surface", "image", "mask", "fire_cooldown", "shake_timer", "shake_intensity",
+        "has_shield", "shield_timer", "has_speed_boost", "speed_boost_timer",
+        "has_rapid_fire", "rapid_fire_timer", "is_moving", "last_key_pressed",
+    )
+    _shield_surfaces = {}  # shield bubbles by opacity
+
     def __init__(self, image, x, y, pixel_on):
         super().__init__(x, y)
         self.pixel = pixel_on
@@ -63,7 +88,7 @@ class TankUnit(GameObject):
             tank_sprite = resource_manager.get_image("sprites/tank.png")
             if tank_sprite:
                 # Ensure surface has per-pixel alpha and scale it
-                tank_sprite = pygame.transform.scale(tank_sprite, (WORLD_SCALE*3, WORLD_SCALE*3)).convert_alpha()
+                tank_sprite = to_display_format(pygame.transform.scale(tank_sprite, (WORLD_SCALE*3, WORLD_SCALE*3)))
                 # Create rotated orientations using pygame transforms (keeps alpha)
                 self.orientations = {
                     0: pygame.transform.rotate(tank_sprite, 90),   # Left
@@ -85,6 +110,9 @@ class TankUnit(GameObject):
         self.trail = []  # stores past positions
         self.max_trail = TANK_TRAIL_MAX
         self.trail_duration = TANK_TRAIL_DURATION
+        self.trail_drawn = TANK_TRAIL_MAX  # ghosts actually drawn, lowered by the quality governor
+        self.shake_enabled = True
+        self.shield_drawn = True
         
         # Power-up states
         self.has_shield = False
@@ -107,9 +135,31 @@ class TankUnit(GameObject):
         self.move_sound = self.resource_manager.get_sound("sounds/swoosh0.mp3", MOVE_VOLUME)
         
         
+    def save_position(self):
+        """Remember the tank and bullet positions before a simulation step."""
+        super().save_position()
+        for bullet in self.bullets:
+            bullet.save_position()
+
+    def snapshot(self):
+        """Capture the mutable state of the tank and its bullets for rollback."""
+        state = {name: getattr(self, name) for name in self.SNAPSHOT_FIELDS}
+        state["rect"] = self.rect.copy()
+        state["trail"] = list(self.trail)
+        state["bullets"] = [bullet.snapshot() for bullet in self.bullets]
+        return state
+
+    def restore(self, state):
+        """Rewind the tank and its bullets to a snapshot."""
+        for name in self.SNAPSHOT_FIELDS:
+            setattr(self, name, state[name])
+        self.rect = state["rect"].copy()
+        self.trail = list(state["trail"])
+        self.bullets = [Bullet.restore(bullet) for bullet in state["bullets"]]
+
     def get_shake_offset(self):
         """Get random offset for shake effect."""
-        if self.shake_timer > 0:
+        if self.shake_timer > 0 and self.shake_enabled:
             return np.random.randint(-self.shake_intensity, self.shake_intensity + 1), \
                    np.random.randint(-self.shake_intensity, self.shake_intensity + 1)
         return 0, 0
@@ -126,12 +176,12 @@ class TankUnit(GameObject):
             
     def add_trail(self):
         """Add current position to the trail."""
-        now = pygame.time.get_ticks()
+        now = SimClock.now()
         self.trail.append((self.x, self.y, now))
 
     def update_trail(self):
         """Update trail positions and remove expired ones."""
-        now = pygame.time.get_ticks()
+        now = SimClock.now()
         self.trail = [(x, y, t) for (x, y, t) in self.trail if now - t < self.trail_duration]
 
     def shot(self):
@@ -167,13 +217,29 @@ class TankUnit(GameObject):
                 return bullet  # Return the bullet that hit
         return None
 
-    def move(self, key, controler=0, key_up=False, other_tank=None):
+    def step(self, distances, other_tank=None, world=None):
+        """
+        Move in the current direction by the first of the distances that is free
+        of the other tank and of walls. Returns True if the tank moved.
+        """
+        for distance in distances:
+            new_x = self.x + self.direction[0] * distance
+            new_y = self.y + self.direction[1] * distance
+            temp_rect = pygame.Rect(new_x, new_y, WORLD_SCALE*3, WORLD_SCALE*3)
+            if other_tank and temp_rect.colliderect(other_tank.rect):
+                continue
+            # Check the whole swept area so a boosted move can't jump a thin wall
+            if world is not None and world.blocked(temp_rect.union((self.x, self.y, WORLD_SCALE*3, WORLD_SCALE*3))):
+                continue
+            self.x = new_x
+            self.y = new_y
+            self.update_rect()
+            return True
+        return False
+
+    def move(self, key, controler=0, key_up=False, other_tank=None, world=None):
         """Handle movement based on key input."""
-        # Define control keys for each player
-        keys = [
-            [pygame.K_LEFT, pygame.K_RIGHT, pygame.K_UP, pygame.K_DOWN, pygame.K_RSHIFT],
-            [pygame.K_a, pygame.K_d, pygame.K_w, pygame.K_s, pygame.K_e]
-        ][controler]
+        keys = self.CONTROLS[controler]
         
         # Handle key release for continuous movement
         if key_up:
@@ -198,34 +264,19 @@ class TankUnit(GameObject):
                 self.is_moving = True
                 self.last_key_pressed = key
             
-            # Calculate new position
-            move_distance = WORLD_SCALE * (2 if self.has_speed_boost else 1)
-            new_x = self.x + self.direction[0] * move_distance
-            new_y = self.y + self.direction[1] * move_distance
-            
-            # Create temporary rect for collision detection
-            temp_rect = pygame.Rect(new_x, new_y, WORLD_SCALE*3, WORLD_SCALE*3)
-            
-            # Check for collision with other tank
-            can_move = True
-            if other_tank and temp_rect.colliderect(other_tank.rect):
-                can_move = False
-                
-            # Apply movement if no collision
-            if can_move:
-                self.x = new_x
-                self.y = new_y
-                self.update_rect()
+            # Move two cells with speed boost (one if the second is blocked)
+            distances = (WORLD_SCALE * 2, WORLD_SCALE) if self.has_speed_boost else (WORLD_SCALE,)
+            self.step(distances, other_tank, world)
             
         # Fire key
         elif key == keys[4]:
             self.fire_cooldown *= -1
             self.shot()
 
-    def update(self, other_tank=None):
+    def update(self, other_tank=None, world=None):
         """Update tank state including power-ups and bullets."""
         # Update power-up timers
-        current_time = pygame.time.get_ticks()
+        current_time = SimClock.now()
         
         # Check if any power-ups have expired
         shield_expired = self.has_shield and current_time > self.shield_timer
@@ -256,74 +307,65 @@ class TankUnit(GameObject):
             
         # Handle continuous movement if speed boost is active
         if self.is_moving and self.has_speed_boost:
-            move_distance = WORLD_SCALE * 2  # Double speed with boost
-            # Check for collision with other tank before moving
-            new_x = self.x + self.direction[0] * move_distance
-            new_y = self.y + self.direction[1] * move_distance
-            temp_rect = pygame.Rect(new_x, new_y, WORLD_SCALE*3, WORLD_SCALE*3)
-            
-            can_move = True
-            if other_tank and temp_rect.colliderect(other_tank.rect):
-                can_move = False
-                
-            if can_move:
-                self.x = new_x
-                self.y = new_y
-                self.update_rect()
+            # Double speed with boost
+            if self.step((WORLD_SCALE * 2, WORLD_SCALE), other_tank, world):
                 self.add_trail()
             
-        # Update bullets
+        # Update bullets, dropping those that left the world or hit a wall
         for bullet in self.bullets:
             bullet.move()
+        if world is not None:
+            self.bullets = world.collide_bullets(self.bullets)
             
         # Update visual effects
         self.update_trail()
         self.update_shake()
         
-    def put_on(self, screen):
+    def put_on(self, screen, interpolation=1.0):
         """Draw the tank and its effects on the screen."""
         # Draw echo trail first
-        now = pygame.time.get_ticks()
-        for (tx, ty, t) in self.trail:
+        now = SimClock.now()
+        for (tx, ty, t) in self.trail[max(0, len(self.trail) - self.trail_drawn):]:
             age = now - t
             alpha = int(50 * (1 - age / self.trail_duration))
-            ghost = self.orientation.copy()
-            ghost.set_alpha(max(0, alpha))
-            screen.blit(ghost, (tx, ty))
+            screen.blit(self.orientation, (tx, ty), alpha=max(0, alpha))
 
         # Apply shake offset if active
         offset_x, offset_y = self.get_shake_offset()
+        x, y = self.draw_position(interpolation)
     
         # Draw shield effect if active
-        if self.has_shield:
-            shield_surface = pygame.Surface((WORLD_SCALE*3 + 10, WORLD_SCALE*3 + 10), pygame.SRCALPHA)
+        if self.has_shield and self.shield_drawn:
             # Add pulsing effect based on time remaining
-            current_time = pygame.time.get_ticks()
+            current_time = SimClock.now()
             time_left = self.shield_timer - current_time
             shield_alpha = 100
             if time_left < 1000:  # Last second, make it blink
                 if time_left % 200 < 100:  # Blink every 0.2 seconds
                     shield_alpha = 180
-            shield_color = (0, 100, 255, shield_alpha)  # Semi-transparent blue
-            pygame.draw.ellipse(shield_surface, shield_color, shield_surface.get_rect())
-            screen.blit(shield_surface, (self.x - 5 + offset_x, self.y - 5 + offset_y))
+            screen.blit(self.shield_surface(shield_alpha), (x - 5 + offset_x, y - 5 + offset_y))
     
         # Draw tank with offset
-        screen.blit(self.orientation, (self.x + offset_x, self.y + offset_y))
+        screen.blit(self.orientation, (x + offset_x, y + offset_y))
 
         # Draw bullets
-        for bullet in self.bullets[:]:
-            # Remove bullets that go off-screen
-            if (bullet.x < 0 or bullet.x > screen.get_width() or 
-                bullet.y < 0 or bullet.y > screen.get_height()):
-                self.bullets.remove(bullet)
-            else:
-                bullet.put_on(screen)
+        for bullet in self.bullets:
+            bullet.put_on(screen, interpolation)
                 
+    @classmethod
+    def shield_surface(cls, shield_alpha):
+        """Shield bubble for a given opacity, drawn once and reused."""
+        if shield_alpha not in cls._shield_surfaces:
+            shield_surface = pygame.Surface((WORLD_SCALE*3 + 10, WORLD_SCALE*3 + 10), pygame.SRCALPHA)
+            shield_color = (0, 100, 255, shield_alpha)  # Semi-transparent blue
+            pygame.draw.ellipse(shield_surface, shield_color, shield_surface.get_rect())
+            cls._shield_surfaces[shield_alpha] = shield_surface
+        return cls._shield_surfaces[shield_alpha]
+
     def speed_boost(self, duration):
         """Activate speed boost power-up."""
         self.has_speed_boost = True
-        self.speed_boost_timer = pygame.time.get_ticks() + duration
+        self.speed_boost_timer = SimClock.now() + duration
         # Change tank sprite to speed boost version
         try:
             self.update_tank_sprite("sprites/tank_speed_boost.png")
@@ -333,7 +375,7 @@ class TankUnit(GameObject):
     def activate_shield(self, duration):
         """Activate shield power-up."""
         self.has_shield = True
-        self.shield_timer = pygame.time.get_ticks() + duration
+        self.shield_timer = SimClock.now() + duration
         # Change tank sprite to shield version
         try:
             self.update_tank_sprite("sprites/tank_activate_shield.png")
@@ -343,7 +385,7 @@ class TankUnit(GameObject):
     def rapid_fire(self, duration):
         """Activate rapid fire power-up."""
         self.has_rapid_fire = True
-        self.rapid_fire_timer = pygame.time.get_ticks() + duration
+        self.rapid_fire_timer = SimClock.now() + duration
         # Change tank sprite to red fire version
         try:
             self.update_tank_sprite("sprites/tank_red_fire.png")
@@ -360,7 +402,7 @@ class TankUnit(GameObject):
         try:
             tank_sprite = self.resource_manager.get_image(sprite_path)
             if tank_sprite:
-                tank_sprite = pygame.transform.scale(tank_sprite, (WORLD_SCALE*3, WORLD_SCALE*3)).convert_alpha()
+                tank_sprite = to_display_format(pygame.transform.scale(tank_sprite, (WORLD_SCALE*3, WORLD_SCALE*3)))
                 self.orientations = {
                     0: pygame.transform.rotate(tank_sprite, 90),   # Left
                     1: pygame.transform.rotate(tank_sprite, -90),  # Right
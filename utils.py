@@ -4,16 +4,156 @@ Utility classes and functions for the Sebastopol game.
 import pygame
 import random
 import math
+import time
+from collections import OrderedDict, deque
 from config import *
 
+def to_display_format(surface):
+    """Convert a surface to the display's pixel format, if there is a display surface."""
+    if pygame.display.get_surface() is None:
+        return surface  # e.g. the texture renderer, which uploads any format
+    return surface.convert_alpha()
+
+class SimClock:
+    """
+    Time source for game logic (power-up timers, trails, spawning).
+    Follows pygame's clock unless a simulation driver sets the time explicitly,
+    which keeps the simulation deterministic for rollback and replays.
+    """
+    _now = None
+
+    @classmethod
+    def now(cls):
+        """Current simulation time in milliseconds."""
+        if cls._now is None:
+            return pygame.time.get_ticks()
+        return cls._now
+
+    @classmethod
+    def set(cls, ms):
+        """Pin the simulation time, or pass None to follow pygame's clock again."""
+        cls._now = ms
+
+    @classmethod
+    def advance(cls, ms):
+        """Move pinned simulation time forward by one step."""
+        cls._now = cls.now() + ms
+
+class RateCounter:
+    """
+    Counts named events (simulation steps, renders...) and turns them into
+    per-second rates once a second.
+    """
+    def __init__(self):
+        self.counts = {}
+        self.totals = {}
+        self.rates = {}
+        self.started = time.perf_counter()
+        self.window_start = self.started
+
+    def count(self, name, amount=1):
+        """Record that an event happened."""
+        self.counts[name] = self.counts.get(name, 0) + amount
+        self.totals[name] = self.totals.get(name, 0) + amount
+
+    def update(self):
+        """Refresh the rates if a second has passed. Returns True when they changed."""
+        now = time.perf_counter()
+        elapsed = now - self.window_start
+        if elapsed < 1:
+            return False
+        self.rates = {name: count / elapsed for name, count in self.counts.items()}
+        self.counts = {name: 0 for name in self.counts}
+        self.window_start = now
+        return True
+
+    def report(self):
+        """Average rates since the counter was created."""
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        return ", ".join(f"{total / elapsed:.1f} {name}/s" for name, total in self.totals.items())
+
+class InputLatency:
+    """
+    Measures input-to-display latency: each input is timestamped when the
+    game reads it, marked applied when a simulation step consumes it, and
+    measured at the first present() after that step. Time spent in SDL's
+    event queue before the game reads an input is not visible here.
+    """
+    def __init__(self, keep=1000):
+        self.read_times = []  # inputs read but not simulated yet
+        self.applied_times = []  # simulated but not on screen yet
+        self.samples = deque(maxlen=keep)  # latencies in seconds
+        self.count = 0
+
+    def read(self, inputs=1):
+        """Timestamp inputs as they are read."""
+        now = time.perf_counter()
+        self.read_times.extend([now] * inputs)
+
+    def applied(self):
+        """A simulation step has consumed every input read so far."""
+        self.applied_times.extend(self.read_times)
+        self.read_times = []
+
+    def presented(self):
+        """A frame showing the applied inputs has just been presented."""
+        now = time.perf_counter()
+        for read_time in self.applied_times:
+            self.samples.append(now - read_time)
+        self.count += len(self.applied_times)
+        self.applied_times = []
+
+    def percentile(self, p):
+        """Latency percentile in ms over the recent samples."""
+        ordered = sorted(self.samples)
+        if not ordered:
+            return 0.0
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] * 1000
+
+    def report(self):
+        """Percentiles of the recent latencies."""
+        if not self.samples:
+            return "Input latency: no inputs"
+        return (f"Input latency ({self.count} inputs): p50 {self.percentile(50):.1f} ms, "
+                f"p90 {self.percentile(90):.1f} ms, p99 {self.percentile(99):.1f} ms, "
+                f"max {max(self.samples) * 1000:.1f} ms")
+
+class PhaseTimer:
+    """
+    Wall-clock time of named phases, e.g. the steps from process start to the
+    first frame. Each mark() closes the phase that ran since the previous mark.
+    """
+    def __init__(self, started=None):
+        self.started = time.perf_counter() if started is None else started
+        self.last = self.started
+        self.phases = []  # (name, seconds)
+
+    def mark(self, name):
+        """End the current phase."""
+        now = time.perf_counter()
+        self.phases.append((name, now - self.last))
+        self.last = now
+
+    def report(self):
+        """One line per phase: its own time and the running total, in ms."""
+        lines = [f"Startup profile (started at {self.started:.6f}):"]
+        total = 0.0
+        for name, seconds in self.phases:
+            total += seconds
+            lines.append(f"  {name:<16}{seconds * 1000:8.1f} ms {total * 1000:8.1f} ms")
+        return "\n".join(lines)
+
 class ResourceManager:
     """
-    Singleton class to manage game resources like images and sounds.
-    Prevents loading the same resources multiple times.
+    Singleton class to manage game resources like images, sounds and fonts.
+    Prevents loading the same resources multiple times; everything is loaded
+    on first use.
     """
     _instance = None
-    _sounds = {}
-    _images = {}
+    _sounds = OrderedDict()  # least recently used first
+    _images = OrderedDict()
+    _fonts = {}
+    _listed_sprites = False
     
     @classmethod
     def get_instance(cls):
@@ -21,12 +161,11 @@ class ResourceManager:
             cls._instance = ResourceManager()
         return cls._instance
     
-    def __init__(self):
-        # Print available sprite files for debugging
-        self._print_available_sprites()
-    
     def _print_available_sprites(self):
-        """Print available sprite files in the sprites directory."""
+        """Print available sprite files in the sprites directory, once, after a failed load."""
+        if ResourceManager._listed_sprites:
+            return
+        ResourceManager._listed_sprites = True
         try:
             import os
             if os.path.exists("sprites"):
@@ -44,6 +183,8 @@ class ResourceManager:
             sound = pygame.mixer.Sound(path)
             sound.set_volume(volume)
             self._sounds[path] = sound
+            self._evict(self._sounds, SOUND_CACHE_MAX)
+        self._sounds.move_to_end(path)
         return self._sounds[path]
     
     def get_image(self, path):
@@ -52,13 +193,29 @@ class ResourceManager:
             try:
                 # Print for debugging
                 print(f"Attempting to load image: {path}")
-                self._images[path] = pygame.image.load(path).convert_alpha()
+                self._images[path] = to_display_format(pygame.image.load(path))
                 print(f"Successfully loaded image: {path}")
             except pygame.error as e:
                 print(f"Could not load image: {path} - Error: {e}")
+                self._print_available_sprites()
                 return None
+            self._evict(self._images, IMAGE_CACHE_MAX)
+        self._images.move_to_end(path)
         return self._images[path]
 
+    def get_font(self, path, size):
+        """Load a font at a size or return it from cache."""
+        key = (path, size)
+        if key not in self._fonts:
+            self._fonts[key] = pygame.font.Font(path, size)
+        return self._fonts[key]
+
+    @staticmethod
+    def _evict(cache, capacity):
+        """Drop the least recently used entries beyond the cache capacity."""
+        while len(cache) > capacity:
+            cache.popitem(last=False)
+
 class GameObject(pygame.sprite.Sprite):
     """
     Base class for all game objects (tanks, bullets, power-ups).
@@ -73,6 +230,8 @@ class GameObject(pygame.sprite.Sprite):
         self.image = None  # Sprite image
         self.rect = None
         self.mask = None  # For pixel-perfect collision
+        self.prev_x = x  # Position at the previous simulation step
+        self.prev_y = y
         self.update_rect()
     
     def update_rect(self):
@@ -98,11 +257,21 @@ class GameObject(pygame.sprite.Sprite):
     def update(self):
         """Update the game object state. Override in subclasses."""
         pass
+
+    def save_position(self):
+        """Remember the current position before a simulation step."""
+        self.prev_x = self.x
+        self.prev_y = self.y
+
+    def draw_position(self, interpolation=1.0):
+        """Position interpolated between the previous and current simulation step."""
+        return (round(self.prev_x + (self.x - self.prev_x) * interpolation),
+                round(self.prev_y + (self.y - self.prev_y) * interpolation))
     
-    def put_on(self, screen):
+    def put_on(self, screen, interpolation=1.0):
         """Draw the game object on the screen."""
         if self.surface:
-            screen.blit(self.surface, (self.x, self.y))
+            screen.blit(self.surface, self.draw_position(interpolation))
             
     def collides_with(self, other):
         """Check if this object collides with another object using sprite collision."""
@@ -141,6 +310,7 @@ class PowerUp(GameObject):
             
         self.type = power_type
         self.active = True
+        self.spawn_time = SimClock.now()
         self.create_surface()
         # Ensure rect is properly sized
         self.rect = pygame.Rect(self.x, self.y, WORLD_SCALE, WORLD_SCALE)
@@ -170,6 +340,20 @@ class PowerUp(GameObject):
         self.image = self.surface
         self.mask = pygame.mask.from_surface(self.image)
         
+    def snapshot(self):
+        """Capture the mutable state of the power-up for rollback."""
+        return (self, self.active)
+
+    @staticmethod
+    def restore(state):
+        """Rewind a power-up to a snapshot and return it."""
+        power_up, power_up.active = state
+        return power_up
+
+    def expired(self, now):
+        """True once the power-up has been lying around for POWERUP_TTL."""
+        return now - self.spawn_time >= POWERUP_TTL
+
     def apply(self, tank):
         """Apply the power-up effect to a tank."""
         if self.type == "speed":
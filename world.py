@@ -5,12 +5,18 @@ Contains the World class for managing the game environment.
 import pygame
 import numpy as np
 import random
-from utils import GameObject, PowerUp
+import struct
+from utils import GameObject, PowerUp, SimClock
 from config import *
 
+TERRAIN_HEADER = struct.Struct("!4sHH")  # magic, columns, rows; followed by one bit per cell
+TERRAIN_MAGIC = b"SBTM"
+
 class World(GameObject):
     """
     World class for managing the game environment, background, and obstacles.
+    Obstacles are a destructible terrain layer: a NumPy array of hit points per
+    grid cell, looked up directly by bullets, tank movement and the AI.
     """
     def __init__(self, width, height, pixel_off, pixel_on):
         super().__init__(0, 0)
@@ -20,10 +26,29 @@ class World(GameObject):
         self.rect = self.surface.get_rect()
         self.pixel = (pixel_off, pixel_on)
         self.grid = []  # store pixel positions
+        self.grid_phase = np.zeros(0)  # x + y of each grid position, for the shimmer
         self.power_ups = []  # store active power-ups
         self.last_power_up_time = 0
         self.power_up_cooldown = 5000  # 5 seconds between power-up spawns
+        self.logical = LOGICAL_RENDERING  # draw cell layers at one pixel per cell
+        self.logical_surface = None
+        self.shimmer = True  # draw the shimmering background
+        self.shimmer_interval = 1  # frames between logical shimmer updates
+        self.shimmer_frame = 0
+        self.logical_version = -1
+
+        # Terrain: hit points left per cell (0 = open), rows x cols over self.grid
+        self.cols = int(width / WORLD_SCALE)
+        self.rows = int(height / WORLD_SCALE)
+        self.terrain = np.zeros((self.rows, self.cols), dtype=np.uint8)
+        self.terrain_map = self.terrain.copy()  # the map as loaded, for new rounds
+        self.terrain_version = 0  # bumped on every change, so caches know when to refresh
+        self.dirty = []  # rects of self.surface repainted since the last draw
+        self.wall_tiles, self.wall_colors = self.make_wall_tiles()
+        self.open_version = -1
         self.draw()
+        if TERRAIN_MAP:
+            self.load_terrain(TERRAIN_MAP)
 
     def draw(self):
         """Draw the initial world grid."""
@@ -33,25 +58,181 @@ class World(GameObject):
                 self.grid.append(pos)
                 self.surface.blit(self.pixel[0], pos)
 
+    def make_wall_tiles(self):
+        """Wall sprites and colors by hit points left, fading towards the floor as they are chipped."""
+        floor = np.array(pygame.transform.average_color(self.pixel[0])[:3], dtype=np.float32)
+        wall = np.array(TERRAIN_COLOR, dtype=np.float32)
+        colors = np.array([floor + (wall - floor) * hp / TERRAIN_HP for hp in range(TERRAIN_HP + 1)], dtype=np.uint8)
+        tiles = [None]
+        for color in colors[1:]:
+            tile = pygame.Surface((WORLD_SCALE, WORLD_SCALE))
+            tile.fill(color)
+            pygame.draw.rect(tile, color // 2, tile.get_rect(), 1)
+            tiles.append(tile)
+        return tiles, colors
+
+    def load_terrain(self, path):
+        """
+        Load a terrain map: a PNG mask with one pixel per cell (bright = wall) or
+        a .bin bitmap written by save_terrain. Maps are cropped or padded to the grid.
+        """
+        try:
+            if path.endswith(".bin"):
+                with open(path, "rb") as f:
+                    data = f.read()
+                magic, cols, rows = TERRAIN_HEADER.unpack_from(data)
+                if magic != TERRAIN_MAGIC:
+                    raise ValueError("not a terrain bitmap")
+                bits = np.frombuffer(data, np.uint8, offset=TERRAIN_HEADER.size)
+                solid = np.unpackbits(bits, count=cols * rows).reshape(rows, cols).astype(bool)
+            else:
+                solid = (pygame.surfarray.array3d(pygame.image.load(path)).max(axis=2) > 127).T
+        except (OSError, ValueError, pygame.error) as e:
+            print(f"Could not load terrain {path}: {e}")
+            return False
+
+        terrain = np.zeros_like(self.terrain)
+        rows, cols = min(self.rows, solid.shape[0]), min(self.cols, solid.shape[1])
+        terrain[:rows, :cols] = np.where(solid[:rows, :cols], TERRAIN_HP, 0)
+        self.terrain_map = terrain
+        self.set_terrain(terrain)
+        print(f"Loaded terrain {path}: {int(np.count_nonzero(terrain))} wall cells")
+        return True
+
+    def save_terrain(self, path):
+        """Save the current walls as a compact bitmap (one bit per cell)."""
+        with open(path, "wb") as f:
+            f.write(TERRAIN_HEADER.pack(TERRAIN_MAGIC, self.cols, self.rows))
+            f.write(np.packbits(self.terrain > 0).tobytes())
+
+    def set_terrain(self, terrain):
+        """Replace the terrain, repainting only the cells that changed."""
+        changed = np.argwhere(self.terrain != terrain)
+        if len(changed):
+            self.terrain[:] = terrain
+            for row, col in changed:
+                self.paint_cell(col, row)
+            self.terrain_version += 1
+
+    def reset_terrain(self):
+        """Rebuild every wall of the loaded map."""
+        self.set_terrain(self.terrain_map)
+
+    def paint_cell(self, col, row):
+        """Redraw one cell of the world surface after its terrain changed."""
+        rect = pygame.Rect(col * WORLD_SCALE, row * WORLD_SCALE, WORLD_SCALE, WORLD_SCALE)
+        hp = self.terrain[row, col]
+        self.surface.fill((0, 0, 0, 0), rect)
+        self.surface.blit(self.wall_tiles[hp] if hp else self.pixel[0], rect)
+        self.dirty.append(rect)
+
+    def solid_at(self, x, y):
+        """True if the cell under a world position is a wall."""
+        col, row = int(x) // WORLD_SCALE, int(y) // WORLD_SCALE
+        return 0 <= col < self.cols and 0 <= row < self.rows and self.terrain[row, col] > 0
+
+    def blocked(self, rect):
+        """True if any cell under a rect is a wall. Off the world counts as open."""
+        rect = rect.clip(self.rect)
+        if not rect.width or not rect.height:
+            return False
+        left, top = rect.left // WORLD_SCALE, rect.top // WORLD_SCALE
+        right, bottom = (rect.right - 1) // WORLD_SCALE + 1, (rect.bottom - 1) // WORLD_SCALE + 1
+        return bool(self.terrain[top:bottom, left:right].any())
+
+    def chip(self, col, row, damage=1):
+        """Take hit points off a wall cell, destroying it at zero."""
+        hp = self.terrain[row, col]
+        if hp:
+            self.terrain[row, col] = max(0, int(hp) - damage)
+            self.paint_cell(col, row)
+            self.terrain_version += 1
+
+    def collide_bullets(self, bullets):
+        """
+        Return the bullets that are still in the world and not inside a wall.
+        All bullets are looked up in the terrain array at once; walls that were
+        hit are chipped by the bullet's damage.
+        """
+        if not bullets:
+            return bullets
+        cols = np.array([int(bullet.x) for bullet in bullets]) // WORLD_SCALE
+        rows = np.array([int(bullet.y) for bullet in bullets]) // WORLD_SCALE
+        inside = (cols >= 0) & (cols < self.cols) & (rows >= 0) & (rows < self.rows)
+        solid = np.zeros(len(bullets), dtype=bool)
+        solid[inside] = self.terrain[rows[inside], cols[inside]] > 0
+        for i in np.flatnonzero(solid):
+            self.chip(cols[i], rows[i], bullets[i].damage)
+        return [bullet for bullet, keep in zip(bullets, inside & ~solid) if keep]
+
+    def flush(self, screen):
+        """Tell the renderer which parts of the world surface were repainted."""
+        for rect in self.dirty:
+            screen.update_region(self.surface, rect)
+        self.dirty = []
+
     def turbulence(self, screen, time):
         """Create a shimmering effect on the background."""
-        for i, (x, y) in enumerate(self.grid):
-            alpha = int(128 + 127 * np.sin((x + y + time) * 0.01))  # smooth shimmer
-            pixel = self.pixel[1].copy()
-            pixel.set_alpha(alpha)
-            screen.blit(pixel, (x, y))
+        if len(self.grid_phase) != len(self.grid):
+            self.grid_phase = np.array([x + y for x, y in self.grid])
+            self.open_version = -1
+        if self.open_version != self.terrain_version:
+            # Walls don't shimmer; self.grid is in the same row-major order as the terrain
+            open_cells = np.flatnonzero(self.terrain.ravel() == 0)
+            self.open_grid = [self.grid[i] for i in open_cells]
+            self.open_phase = self.grid_phase[open_cells]
+            self.open_version = self.terrain_version
+        alphas = (128 + 127 * np.sin((self.open_phase + time) * 0.01)).astype(int)  # smooth shimmer
+        screen.blits(self.pixel[1], self.open_grid, alphas.tolist())
+
+    def put_on_logical(self, screen, time):
+        """
+        Draw the background and shimmer at one pixel per cell, then scale the
+        result up to the screen once. Each cell is drawn in the average color of
+        its sprite, so this trades sprite detail for 1/WORLD_SCALE² of the pixel work.
+        """
+        cols = min(self.width, screen.get_width()) // WORLD_SCALE
+        rows = min(self.height, screen.get_height()) // WORLD_SCALE
+        if self.logical_surface is None or self.logical_surface.get_size() != (cols, rows):
+            self.logical_surface = pygame.Surface((cols, rows))
+            xs = np.arange(cols) * WORLD_SCALE
+            ys = np.arange(rows) * WORLD_SCALE
+            self.logical_phase = xs[:, None] + ys[None, :]  # x + y per cell, like the shimmer
+            self.logical_colors = [np.array(pygame.transform.average_color(pixel)[:3], dtype=np.float32)
+                                   for pixel in self.pixel]
+
+        # Same shimmer as turbulence(): the "on" pixel blended over the "off" one
+        if self.shimmer_frame % self.shimmer_interval == 0 or self.logical_version != self.terrain_version:
+            off, on = self.logical_colors
+            alphas = (128 + 127 * np.sin((self.logical_phase + time) * 0.01)).astype(int) / 255
+            cells = off + (on - off) * alphas[:, :, None]
+            hp = self.terrain[:rows, :cols].T
+            cells[hp > 0] = self.wall_colors[hp[hp > 0]]
+            pygame.surfarray.blit_array(self.logical_surface, cells.astype(np.uint8))
+            self.logical_version = self.terrain_version
+        self.shimmer_frame += 1
+        self.flush(screen)  # keep the full-resolution surface current for quality changes
+        screen.blit_scaled(self.logical_surface, pygame.Rect(0, 0, cols * WORLD_SCALE, rows * WORLD_SCALE))
+
+        # Full-resolution sprites on top
+        for power_up in self.power_ups:
+            power_up.put_on(screen)
 
     def spawn_power_up(self):
         """Randomly spawn a power-up in the world."""
-        current_time = pygame.time.get_ticks()
+        current_time = SimClock.now()
         
         # Check if it's time to spawn a power-up
+        if len(self.power_ups) >= POWERUP_MAX:
+            return
         if (current_time - self.last_power_up_time > self.power_up_cooldown and 
             random.random() < POWERUP_SPAWN_RATE):
             
             # Choose a random position
             x = random.randint(1, int(self.width / WORLD_SCALE) - 2) * WORLD_SCALE
             y = random.randint(1, int(self.height / WORLD_SCALE) - 2) * WORLD_SCALE
+            if self.solid_at(x, y):
+                return  # try again next frame rather than bury it in a wall
             
             # Create a new power-up
             power_up = PowerUp(x, y)
@@ -60,7 +241,9 @@ class World(GameObject):
 
     def update(self, tanks):
         """Update the world state including power-ups."""
-        # Spawn new power-ups
+        # Remove power-ups nobody picked up in time, then spawn new ones
+        now = SimClock.now()
+        self.power_ups = [power_up for power_up in self.power_ups if not power_up.expired(now)]
         self.spawn_power_up()
         
         # Check for power-up collisions with tanks
@@ -77,9 +260,21 @@ class World(GameObject):
                         # Debug print to confirm power-up was collected
                         print(f"Power-up collected: {power_up.type} by tank at {tank.x}, {tank.y}")
 
+    def snapshot(self):
+        """Capture the power-ups, spawn timer and terrain for rollback."""
+        return ([power_up.snapshot() for power_up in self.power_ups], self.last_power_up_time,
+                self.terrain.copy())
+
+    def restore(self, state):
+        """Rewind the power-ups, spawn timer and terrain to a snapshot."""
+        power_ups, self.last_power_up_time, terrain = state
+        self.power_ups = [PowerUp.restore(power_up) for power_up in power_ups]
+        self.set_terrain(terrain)
+
     def put_on(self, screen, offset=(0, 0)):
         """Draw the world and its elements on the screen."""
         # Draw the base world
+        self.flush(screen)
         screen.blit(self.surface, offset)
         
         # Draw power-ups
@@ -87,8 +282,9 @@ class World(GameObject):
             power_up.put_on(screen)
 
 if __name__ == '__main__':
+    from render import SurfaceRenderer
     pygame.init()
-    screen = pygame.display.set_mode((500, 500))
+    screen = SurfaceRenderer((500, 500))
     clock = pygame.time.Clock()
     pixel_on = pygame.image.load('pixels/b1.png').convert()
     pixel_off = pygame.image.load('pixels/diago 0.png').convert()
@@ -104,7 +300,7 @@ if __name__ == '__main__':
         bg.update([])  # No tanks in this test
         bg.put_on(screen)
         bg.turbulence(screen, pygame.time.get_ticks())
-        pygame.display.flip()
+        screen.present()
         clock.tick(FPS)
         
     pygame.quit()